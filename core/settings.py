@@ -190,3 +190,62 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+
+# Redis used by the application caches (separate database from the Celery broker)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/1')
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))
+
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '10000'))
+TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', str(30 * 24 * 3600)))
+
+CONVERSATION_CACHE_TTL = int(os.getenv('CONVERSATION_CACHE_TTL', str(24 * 3600)))
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '5000'))
+EMBEDDING_CACHE_TTL = int(os.getenv('EMBEDDING_CACHE_TTL', str(30 * 24 * 3600)))
+
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_ENTRIES', '1000'))
+TRANSCRIPTION_CACHE_TTL = int(os.getenv('TRANSCRIPTION_CACHE_TTL', str(24 * 3600)))
+
+# Vector store used by retrieve_context: "pinecone", "local" or "auto"
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'pinecone')
+LOCAL_VECTOR_INDEX_DIR = os.getenv('LOCAL_VECTOR_INDEX_DIR', os.path.join(BASE_DIR, 'vector_index'))
+
+# Serve the LLM-bound endpoints with async views; only useful under an ASGI server
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
+CELERY_TASK_TRACK_STARTED = True
+# Speech synthesis dispatch is pure network I/O and runs on its own gevent worker
+# (see the celery-tts service in docker-compose.yml)
+CELERY_TASK_ROUTES = {
+    'learning.tasks.post_text_to_service': {'queue': 'tts'},
+    'learning.tasks.flush_text_to_service': {'queue': 'tts'},
+}
+# Messages for the same synthesizer queued within this window are sent as one request
+TTS_COALESCE_SECONDS = float(os.getenv('TTS_COALESCE_SECONDS', '0.3'))
+TTS_PENDING_TTL = int(os.getenv('TTS_PENDING_TTL', '60'))
+TTS_REQUEST_TIMEOUT = (3.05, float(os.getenv('TTS_READ_TIMEOUT', '30')))
+TTS_POOL_SIZE = int(os.getenv('TTS_POOL_SIZE', '100'))
+REPORT_TASK_SOFT_TIME_LIMIT = int(os.getenv('REPORT_TASK_SOFT_TIME_LIMIT', '120'))
+REPORT_TASK_TIME_LIMIT = int(os.getenv('REPORT_TASK_TIME_LIMIT', '150'))
+
+# Seconds between mtime checks of the prompt files
+PROMPT_RELOAD_INTERVAL = float(os.getenv('PROMPT_RELOAD_INTERVAL', '1.0'))
+
+# Token budget for the recent dialogue sent with every chat turn; older turns
+# are folded into a rolling summary once at least CHAT_SUMMARY_MIN_MESSAGES
+# messages have fallen out of the window, and are sent in full until then
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+CHAT_SUMMARY_MIN_MESSAGES = int(os.getenv('CHAT_SUMMARY_MIN_MESSAGES', '4'))
+
+# Retrieved passages below this similarity score are not sent to the model,
+# and the passages that are sent are capped at this many tokens per turn
+RAG_MIN_SCORE = float(os.getenv('RAG_MIN_SCORE', '0.3'))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', '800'))
+
+# Audio uploads are kept in memory end to end, so uploads up to the audio limit
+# must not be spooled to disk by Django either
+AUDIO_MAX_UPLOAD_BYTES = int(os.getenv('AUDIO_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+AUDIO_MAX_DURATION_SECONDS = int(os.getenv('AUDIO_MAX_DURATION_SECONDS', '300'))
+AUDIO_CHUNK_SECONDS = int(os.getenv('AUDIO_CHUNK_SECONDS', '60'))
+FILE_UPLOAD_MAX_MEMORY_SIZE = AUDIO_MAX_UPLOAD_BYTES
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Experience, ReadingQuestion, ReadingAnswer, GPTReport, Chat, Reading, Lessons, Tasks, TaskAnswer
+from .models import Experience, ReadingQuestion, ReadingAnswer, GPTReport, Chat, Reading, Lessons, Tasks, TaskAnswer, \
+    ChatMessage
 
 
 @admin.register(Experience)
@@ -54,3 +55,4 @@ admin.site.register(Reading)
 admin.site.register(Lessons)
 admin.site.register(Tasks)
 admin.site.register(TaskAnswer)
+admin.site.register(ChatMessage)
@@ -0,0 +1,144 @@
+"""
+Async versions of the LLM-bound views, served when ASYNC_VIEWS is enabled and
+the project runs under an ASGI server (see README). DRF views are synchronous,
+so these are plain Django async views that reuse DRF's JWT authentication.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .audio import AudioRejected, AudioUnreadable, read_upload
+from .models import Chat
+from .open import User, aquery_api, aquery_api_stream, aanalyze_dialogue, acheck_reading_answers
+from .tasks import post_text_to_service, queue_report, save_report
+from .views import SYNTHESIZE_URL, get_reading_inputs, save_reading_answers
+
+
+def jwt_authenticated(view):
+    """Async counterpart of ``IsAuthenticated`` with ``JWTAuthentication``."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        if result is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return {}
+
+
+async def queue_synthesis(response_text):
+    await sync_to_async(post_text_to_service.delay, thread_sensitive=False)(SYNTHESIZE_URL, {"text": response_text})
+
+
+async def stream_chat_response(user, prompt_kk):
+    """
+    Async counterpart of ``views.stream_chat_response``. Under ASGI Django
+    buffers a sync iterator completely before sending it, so the events have
+    to come from an async generator to reach the client sentence by sentence.
+    """
+    sentences = []
+    try:
+        async for sentence in aquery_api_stream(user, prompt_kk):
+            sentences.append(sentence)
+            yield f"event: sentence\ndata: {json.dumps({'sentence': sentence}, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        return
+
+    response_text = " ".join(sentences)
+    await queue_synthesis(response_text)
+    yield f"event: done\ndata: {json.dumps({'response': response_text}, ensure_ascii=False)}\n\n"
+
+
+@csrf_exempt
+@require_POST
+@jwt_authenticated
+async def send_text(request, chat_id):
+    if not await Chat.objects.filter(id=chat_id).aexists():
+        return JsonResponse({'error': 'Chat not found'}, status=status.HTTP_404_NOT_FOUND)
+    user = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
+    prompt_kk = json_body(request).get('prompt_kk')
+
+    if request.GET.get('stream') in ('1', 'true'):
+        response = StreamingHttpResponse(stream_chat_response(user, prompt_kk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    response_text = await aquery_api(user, prompt_kk)
+    await queue_synthesis(response_text)
+    return JsonResponse({'response': response_text})
+
+
+@csrf_exempt
+@require_POST
+@jwt_authenticated
+async def upload_audio(request, chat_id):
+    audio_file = request.FILES.get('audio_file')
+    if not audio_file:
+        return JsonResponse({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    if not await Chat.objects.filter(id=chat_id).aexists():
+        return JsonResponse({'error': 'Chat not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    user = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
+    try:
+        audio = read_upload(audio_file, settings.AUDIO_MAX_UPLOAD_BYTES)
+        response_text = await aquery_api(user, audio=audio, audio_name=audio_file.name)
+    except AudioRejected as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except AudioUnreadable as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    await queue_synthesis(response_text)
+    return JsonResponse({'response': response_text})
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@jwt_authenticated
+async def generate_report(request, chat_id):
+    if request.method == "POST":
+        job_id = await sync_to_async(queue_report, thread_sensitive=False)(request.user.id, chat_id)
+        return JsonResponse({'job_id': job_id}, status=status.HTTP_202_ACCEPTED)
+
+    chat = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
+    result = await aanalyze_dialogue(chat)
+    await sync_to_async(save_report)(request.user, result)
+    return JsonResponse({"report": result})
+
+
+@csrf_exempt
+@require_POST
+@jwt_authenticated
+async def reading_answer(request):
+    answers_kk, question_ids, questions_en_list, text = await sync_to_async(get_reading_inputs)(
+        json_body(request).get('answers', [])
+    )
+
+    api_result = await acheck_reading_answers(answers_kk, questions_en_list, text)
+
+    try:
+        await sync_to_async(save_reading_answers)(request.user, question_ids, answers_kk, api_result)
+    except Exception as e:
+        return JsonResponse({'error': 'Failed to save reading answers. ' + str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return JsonResponse(api_result)
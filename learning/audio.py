@@ -0,0 +1,142 @@
+import io
+import os
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+
+SPEECH_FRAME_RATE = 16000
+# Opus in Ogg: accepted by Whisper and ~3 KB/s for speech at 24 kbit/s
+ENCODE_FORMAT = "ogg"
+ENCODE_CODEC = "libopus"
+ENCODE_BITRATE = "24k"
+# ffmpeg demuxer for every upload extension we know; any other file is probed
+INPUT_FORMATS = {
+    "webm": "webm", "weba": "webm",
+    "ogg": "ogg", "oga": "ogg", "opus": "ogg",
+    "mp3": "mp3", "mpga": "mp3", "mpeg": "mp3",
+    "m4a": "mp4", "mp4": "mp4",
+    "aac": "aac",
+    "wav": "wav",
+    "flac": "flac",
+}
+
+
+class AudioRejected(ValueError):
+    """The uploaded audio is too large or too long to be transcribed."""
+
+
+class AudioUnreadable(ValueError):
+    """The upload is not audio ffmpeg can decode."""
+
+
+def read_upload(uploaded_file, max_bytes):
+    """Copy an uploaded file into an in-memory buffer, refusing anything over ``max_bytes``."""
+    if uploaded_file.size is not None and uploaded_file.size > max_bytes:
+        raise AudioRejected(f"Audio file is larger than {max_bytes // (1024 * 1024)} MB.")
+    buffer = io.BytesIO()
+    for chunk in uploaded_file.chunks():
+        buffer.write(chunk)
+        if buffer.tell() > max_bytes:
+            raise AudioRejected(f"Audio file is larger than {max_bytes // (1024 * 1024)} MB.")
+    buffer.seek(0)
+    return buffer
+
+
+def decode(audio, filename, max_duration_ms=None):
+    """
+    Decode an upload to PCM. With ``max_duration_ms`` ffmpeg stops one second
+    past the limit, so a long but well-compressed file cannot blow up to
+    hundreds of MB of samples before it is rejected.
+    """
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    duration = None if max_duration_ms is None else max_duration_ms / 1000 + 1
+    try:
+        return AudioSegment.from_file(audio, format=INPUT_FORMATS.get(extension), duration=duration)
+    except CouldntDecodeError as e:
+        raise AudioUnreadable("Audio file could not be decoded.") from e
+
+
+def frame_levels(segment, frame_ms):
+    """Loudness of every ``frame_ms`` frame in dBFS, computed in one vectorized pass."""
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+    frame_length = max(1, int(segment.frame_rate * frame_ms / 1000))
+    count = len(samples) // frame_length
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:count * frame_length].reshape(count, frame_length)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    full_scale = float(1 << (8 * segment.sample_width - 1))
+    return 20 * np.log10(np.maximum(rms, 1e-9) / full_scale)
+
+
+def silence_midpoints(segment, frame_ms=20, min_silence_ms=400, threshold_db=-16):
+    """Millisecond positions in the middle of every pause that is at least ``min_silence_ms`` long."""
+    levels = frame_levels(segment, frame_ms)
+    silent = levels < segment.dBFS + threshold_db
+    # Edges of silent runs: +1 where a run starts, -1 just after it ends
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) * frame_ms >= min_silence_ms
+    return [int((start + end) * frame_ms / 2) for start, end in zip(starts[long_enough], ends[long_enough])]
+
+
+def trim_silence(segment, frame_ms=20, threshold_db=-16, padding_ms=200):
+    """Energy-based VAD: drop leading and trailing frames quieter than the clip average + ``threshold_db``."""
+    levels = frame_levels(segment, frame_ms)
+    voiced = np.flatnonzero(levels >= segment.dBFS + threshold_db)
+    if len(voiced) == 0:
+        return segment
+    start = max(0, int(voiced[0]) * frame_ms - padding_ms)
+    end = min(len(segment), (int(voiced[-1]) + 1) * frame_ms + padding_ms)
+    return segment[start:end]
+
+
+def normalize_for_speech(segment):
+    """Trim silence and convert to the 16 kHz mono, 16-bit format speech models expect."""
+    return trim_silence(segment).set_frame_rate(SPEECH_FRAME_RATE).set_channels(1).set_sample_width(2)
+
+
+def encode(segment):
+    buffer = io.BytesIO()
+    segment.export(buffer, format=ENCODE_FORMAT, codec=ENCODE_CODEC, bitrate=ENCODE_BITRATE)
+    return buffer.getvalue()
+
+
+def split_at_silence(segment, max_chunk_ms):
+    """
+    Cut ``segment`` into chunks of at most ``max_chunk_ms``, each ending at the
+    last pause before the limit (or at the limit when there is no pause).
+    """
+    if len(segment) <= max_chunk_ms:
+        return [segment]
+
+    pauses = silence_midpoints(segment)
+    chunks = []
+    start = 0
+    while len(segment) - start > max_chunk_ms:
+        limit = start + max_chunk_ms
+        candidates = [pause for pause in pauses if start + max_chunk_ms // 2 < pause <= limit]
+        cut = candidates[-1] if candidates else limit
+        chunks.append(segment[start:cut])
+        start = cut
+    chunks.append(segment[start:])
+    return chunks
+
+
+def speech_chunks(audio, filename, max_duration_ms, max_chunk_ms):
+    """
+    Decode an upload into silence-trimmed 16 kHz mono chunks of at most
+    ``max_chunk_ms``, cut at pauses.
+    """
+    segment = decode(audio, filename, max_duration_ms)
+    if len(segment) > max_duration_ms:
+        raise AudioRejected(f"Audio is longer than {max_duration_ms // 1000} seconds.")
+    return split_at_silence(normalize_for_speech(segment), max_chunk_ms)
+
+
+def as_upload(chunk):
+    """The ``(filename, bytes)`` pair sent to the transcription API for a chunk."""
+    return f"audio.{ENCODE_FORMAT}", encode(chunk)
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """Process-wide Redis client; the underlying connection pool is thread-safe."""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+    return _redis_client
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so that trivially different spellings share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TieredCache:
+    """
+    Two-level cache: a bounded in-process LRU in front of a shared Redis tier.
+
+    Values are stored in Redis as bytes, so ``dumps``/``loads`` convert between
+    the cached Python value and its wire form. Redis failures are logged and
+    treated as misses so the caller always falls back to the origin.
+    """
+
+    def __init__(self, prefix, max_entries=10000, ttl=7 * 24 * 3600, local_ttl=3600,
+                 dumps=None, loads=None):
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.dumps = dumps or (lambda value: value.encode("utf-8"))
+        self.loads = loads or (lambda raw: raw.decode("utf-8"))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return a dict with the cached value for every key that was found."""
+        # Each distinct key is one lookup, however often it is repeated
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self._get_local(key)
+            if value is not None:
+                found[key] = value
+            else:
+                remote_keys.append(key)
+        local_hits = len(found)
+
+        if remote_keys:
+            try:
+                raw_values = get_redis().mget([self._redis_key(key) for key in remote_keys])
+            except redis.RedisError as e:
+                logger.warning("Redis read failed for %s: %s", self.prefix, e)
+                raw_values = [None] * len(remote_keys)
+            for key, raw in zip(remote_keys, raw_values):
+                if raw is None:
+                    continue
+                value = self.loads(raw)
+                found[key] = value
+                self._set_local(key, value)
+
+        with self._lock:
+            self.local_hits += local_hits
+            self.redis_hits += len(found) - local_hits
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, mapping):
+        if not mapping:
+            return
+        for key, value in mapping.items():
+            self._set_local(key, value)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(self._redis_key(key), self.dumps(value), ex=self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Redis write failed for %s: %s", self.prefix, e)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.redis_hits + self.misses
+            return {
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+                "local_size": len(self._local),
+            }
@@ -0,0 +1,188 @@
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from .cache import get_redis
+from .models import Chat, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """
+    Chat history shared by every web and Celery process.
+
+    Postgres is the durable tier (one ``ChatMessage`` row per message) and Redis
+    is the hot tier (one append-only list of JSON messages per chat). Only the
+    dialogue is stored; the system prompt is rebuilt for every turn.
+
+    Appends are serialized per chat with a Redis lock. The unique (chat, seq)
+    constraint is the fallback when Redis is unavailable: a writer that loses
+    the race re-reads the next sequence number and retries.
+    """
+
+    def __init__(self, ttl=24 * 3600, lock_timeout=10, max_retries=3):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.max_retries = max_retries
+
+    def _key(self, chat_id):
+        return f"chat:{chat_id}:messages"
+
+    def _lock(self, chat_id):
+        return get_redis().lock(
+            f"chat:{chat_id}:lock", timeout=self.lock_timeout, blocking_timeout=self.lock_timeout
+        )
+
+    def _acquire(self, lock, chat_id):
+        try:
+            return lock.acquire()
+        except redis.RedisError as e:
+            logger.warning("Could not lock chat %s: %s", chat_id, e)
+            return False
+
+    def _release(self, lock):
+        try:
+            lock.release()
+        except redis.RedisError:
+            pass
+
+    def load(self, chat_id):
+        """Return the whole dialogue as a list of ``{"role", "content"}`` dicts."""
+        try:
+            raw = get_redis().lrange(self._key(chat_id), 0, -1)
+        except redis.RedisError as e:
+            logger.warning("Redis read failed for chat %s: %s", chat_id, e)
+            raw = None
+        if raw:
+            return [json.loads(message) for message in raw]
+
+        if raw is None:
+            return self._load_durable(chat_id)
+
+        # Warm the hot tier under the chat lock so a concurrent append cannot
+        # slip in between reading Postgres and filling the Redis list.
+        lock = self._lock(chat_id)
+        if not self._acquire(lock, chat_id):
+            return self._load_durable(chat_id)
+        try:
+            messages = self._load_durable(chat_id)
+            if messages:
+                self._warm(chat_id, messages)
+            return messages
+        finally:
+            self._release(lock)
+
+    def _load_durable(self, chat_id):
+        return list(
+            ChatMessage.objects.filter(chat_id=chat_id).order_by('seq').values('role', 'content')
+        )
+
+    def _warm(self, chat_id, messages):
+        key = self._key(chat_id)
+        try:
+            pipe = get_redis().pipeline()
+            pipe.delete(key)
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Redis warm-up failed for chat %s: %s", chat_id, e)
+
+    def append(self, chat_id, *messages):
+        """Append messages to the end of the dialogue in O(len(messages))."""
+        messages = [{"role": message["role"], "content": message["content"]} for message in messages]
+        lock = self._lock(chat_id)
+        if not self._acquire(lock, chat_id):
+            self._append_durable(chat_id, messages)
+            self._invalidate(chat_id)
+            return
+
+        try:
+            self._append_durable(chat_id, messages)
+            self._append_hot(chat_id, messages)
+        finally:
+            self._release(lock)
+
+    def _append_durable(self, chat_id, messages):
+        for attempt in range(self.max_retries):
+            try:
+                with transaction.atomic():
+                    last_seq = ChatMessage.objects.filter(chat_id=chat_id).aggregate(last=Max('seq'))['last']
+                    first_seq = 0 if last_seq is None else last_seq + 1
+                    ChatMessage.objects.bulk_create([
+                        ChatMessage(chat_id=chat_id, seq=first_seq + i, role=message["role"],
+                                    content=message["content"])
+                        for i, message in enumerate(messages)
+                    ])
+                return
+            except IntegrityError:
+                if attempt == self.max_retries - 1:
+                    raise
+
+    def _append_hot(self, chat_id, messages):
+        # RPUSHX only extends a list that is already cached; a cold chat is
+        # loaded from Postgres in full on the next read.
+        key = self._key(chat_id)
+        try:
+            pipe = get_redis().pipeline()
+            pipe.rpushx(key, *[json.dumps(message) for message in messages])
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Redis append failed for chat %s: %s", chat_id, e)
+            self._invalidate(chat_id)
+
+    def _summary_key(self, chat_id):
+        return f"chat:{chat_id}:summary"
+
+    def load_summary(self, chat_id):
+        """Return ``(summary, summary_upto)``: the rolling summary and how many messages it covers."""
+        try:
+            raw = get_redis().get(self._summary_key(chat_id))
+        except redis.RedisError:
+            raw = None
+        if raw:
+            cached = json.loads(raw)
+            return cached["text"], cached["upto"]
+
+        chat = Chat.objects.filter(id=chat_id).values('summary', 'summary_upto').first()
+        if chat is None:
+            return "", 0
+        try:
+            # NX so a stale read never overwrites a summary saved in the meantime
+            get_redis().set(
+                self._summary_key(chat_id),
+                json.dumps({"text": chat['summary'], "upto": chat['summary_upto']}),
+                ex=self.ttl, nx=True,
+            )
+        except redis.RedisError:
+            pass
+        return chat['summary'], chat['summary_upto']
+
+    def save_summary(self, chat_id, summary, upto, expected_upto):
+        """
+        Replace the summary if it still covers ``expected_upto`` messages.
+        Returns False when another worker updated it first.
+        """
+        updated = Chat.objects.filter(id=chat_id, summary_upto=expected_upto) \
+            .update(summary=summary, summary_upto=upto)
+        if updated:
+            try:
+                get_redis().set(self._summary_key(chat_id), json.dumps({"text": summary, "upto": upto}), ex=self.ttl)
+            except redis.RedisError:
+                pass
+        return bool(updated)
+
+    def _invalidate(self, chat_id):
+        try:
+            get_redis().delete(self._key(chat_id))
+        except redis.RedisError:
+            pass
+
+
+conversation_store = ConversationStore(ttl=settings.CONVERSATION_CACHE_TTL)
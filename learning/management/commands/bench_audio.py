@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning.audio import decode, encode, normalize_for_speech
+from learning.open import transcribe_part
+
+
+class Command(BaseCommand):
+    help = "Compare raw audio files with their pre-processed form (size, duration and optionally Whisper latency)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Audio files, e.g. local_vtuber/*.wav")
+        parser.add_argument('--transcribe', action='store_true', help="Also time Whisper on both versions")
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            with open(path, 'rb') as file:
+                raw = file.read()
+
+            start = time.perf_counter()
+            with open(path, 'rb') as file:
+                segment = decode(file, path)
+            processed_segment = normalize_for_speech(segment)
+            processed = encode(processed_segment)
+            processing_ms = (time.perf_counter() - start) * 1000
+
+            self.stdout.write(
+                f"{path}: {len(raw) / 1024:.1f} KB, {len(segment) / 1000:.2f} s -> "
+                f"{len(processed) / 1024:.1f} KB, {len(processed_segment) / 1000:.2f} s "
+                f"(pre-processing {processing_ms:.0f} ms)"
+            )
+
+            if options['transcribe']:
+                for label, part in (('raw', (path, raw)), ('processed', ("audio.ogg", processed))):
+                    start = time.perf_counter()
+                    text = transcribe_part(part)
+                    self.stdout.write(f"  {label:>9}: {(time.perf_counter() - start) * 1000:.0f} ms  {text!r}")
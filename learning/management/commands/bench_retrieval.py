@@ -0,0 +1,49 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from langchain_pinecone import PineconeVectorStore
+
+from learning.open import HFEmbeddings, PINECONE_INDEX_NAME, retrieve_context
+
+
+class Command(BaseCommand):
+    help = "Measure per-query retrieve_context latency with fresh clients versus the pooled clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', default="Абай Құнанбайұлы кім?")
+        parser.add_argument('--namespace', default="8_kazakh-language-and-literature")
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        query, namespace, runs = options['query'], options['namespace'], options['runs']
+
+        def fresh():
+            # What every call used to do: new embeddings client, new HTTP connection, new vector
+            # store, and a Hugging Face round trip for the query (no embedding cache)
+            vectorstore = PineconeVectorStore(
+                embedding=HFEmbeddings(session=requests.Session(), cache=None),
+                text_key='text',
+                index_name=PINECONE_INDEX_NAME,
+            )
+            vectorstore.similarity_search(query, k=5, namespace=namespace)
+
+        def pooled():
+            retrieve_context(query, namespace=namespace)
+
+        # Warm up the pooled path so the first connection setup is not counted
+        pooled()
+
+        for name, fn in (('fresh', fresh), ('pooled', pooled)):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{name:>7}: mean {statistics.mean(timings):7.1f} ms  "
+                f"p50 {timings[len(timings) // 2]:7.1f} ms  "
+                f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:7.1f} ms"
+            )
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.open import HFEmbeddings, PINECONE_INDEX_NAME, pc
+from learning.vectorindex import LocalVectorIndex
+
+
+class Command(BaseCommand):
+    help = "Build a local vector index namespace from the Pinecone index or from a text file of passages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('namespace')
+        parser.add_argument('--from-file', help="UTF-8 text file with passages separated by blank lines")
+        parser.add_argument('--quantize', action='store_true', help="Store int8 embeddings with per-row scales")
+        parser.add_argument('--batch-size', type=int, default=32)
+
+    def handle(self, *args, **options):
+        namespace = options['namespace']
+        if options['from_file']:
+            texts, vectors = self.from_file(options['from_file'], options['batch_size'])
+        elif pc is not None:
+            texts, vectors = self.from_pinecone(namespace)
+        else:
+            raise CommandError("PINECONE_API_KEY is not set; use --from-file")
+
+        LocalVectorIndex.build(
+            settings.LOCAL_VECTOR_INDEX_DIR, namespace, texts, vectors, quantize=options['quantize']
+        )
+        self.stdout.write(f"Wrote {len(texts)} passages to {settings.LOCAL_VECTOR_INDEX_DIR}/{namespace}")
+
+    def from_file(self, path, batch_size):
+        with open(path, 'r', encoding='utf-8') as file:
+            texts = [passage.strip() for passage in file.read().split('\n\n') if passage.strip()]
+        embeddings = HFEmbeddings()
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(embeddings.embed_documents(texts[i:i + batch_size]))
+        return texts, vectors
+
+    def from_pinecone(self, namespace):
+        index = pc.Index(PINECONE_INDEX_NAME)
+        texts, vectors = [], []
+        for ids in index.list(namespace=namespace):
+            fetched = index.fetch(ids=ids, namespace=namespace)
+            for vector in fetched.vectors.values():
+                texts.append(vector.metadata['text'])
+                vectors.append(vector.values)
+        return texts, vectors
@@ -34,6 +34,13 @@ class Experience(models.Model):
             return self.LEVEL_TITLES[level]
         return "Unknown Level"
 
+    def add_report_scores(self, report_data):
+        """Award experience for the scores of a dialogue analysis."""
+        self.vocabulary_exp += report_data.get('vocabulary', {}).get('score', 0) * 10
+        self.speaking_exp += report_data.get('communication_effectiveness', {}).get('score', 0) * 10
+        self.grammar_exp += report_data.get('contextual_understanding', {}).get('score', 0) * 10
+        self.save()
+
     @property
     def total_level(self):
         """Calculate the total level based on all experience."""
@@ -100,6 +107,25 @@ class GPTReport(models.Model):
 
 class Chat(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats')
+    summary = models.TextField(blank=True, default='')
+    summary_upto = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Chat {self.id} by {self.user.username}"
+
+
+class ChatMessage(models.Model):
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='messages')
+    seq = models.PositiveIntegerField()
+    role = models.CharField(max_length=16)
+    content = models.TextField()
+    datetime = models.DateTimeField(auto_now_add=True, null=True)
+
+    class Meta:
+        ordering = ['chat', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['chat', 'seq'], name='unique_chat_message_seq'),
+        ]
+
+    def __str__(self):
+        return f"Chat {self.chat_id} #{self.seq} ({self.role})"
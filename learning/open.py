@@ -1,13 +1,34 @@
+import asyncio
+import hashlib
+import logging
 import os
+import re
 import json
-import pickle
+import time
 import dataclasses
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from langchain_pinecone import PineconeVectorStore
 from langchain_core.embeddings import Embeddings
-from openai import OpenAI
+from asgiref.sync import sync_to_async
+from openai import AsyncOpenAI, OpenAI
 from pinecone import Pinecone
 from google.cloud import translate_v2
+from django.conf import settings
+
+from .audio import as_upload, speech_chunks
+from .cache import TieredCache, make_key, normalize_text
+from .conversation import conversation_store
+from .prompts import prompt_registry, thaw, ANALYSIS_TOOLS, ANALYSIS_TOOL_CHOICE, READING_TOOLS, READING_TOOL_CHOICE
+from .vectorindex import LocalVectorIndex
+from .window import build_window, count_tokens, window_start
+
+
+logger = logging.getLogger(__name__)
 
 
 @dataclasses.dataclass
@@ -22,19 +43,90 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 HF_API_URL_KK = "https://fiwwjll6hvtug9i0.us-east-1.aws.endpoints.huggingface.cloud"
 HF_API_TOKEN = os.getenv("HF_API_KEY")
+HF_TIMEOUT = 10
+
+PINECONE_INDEX_NAME = "wonk-kk"
+# Shared by the Pinecone client and the Hugging Face connection pool so both
+# can serve the same number of concurrent retrievals
+POOL_SIZE = 30
+
+# Google Translate v2 accepts at most 128 segments per request
+TRANSLATE_BATCH_SIZE = 128
+TRANSLATE_MAX_CONCURRENCY = 4
+
+# Threads shared by all requests for the independent stages of a chat turn
+STAGE_WORKERS = 16
+
+CHAT_MODEL = "gpt-3.5-turbo"
+TRANSCRIBE_MODEL = "whisper-1"
+CHAT_PARAMS = {"temperature": 0.5, "max_tokens": 512}
+
+# A sentence ends with terminal punctuation (plus closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]»]*\s+')
+SUMMARY_MAX_TOKENS = 256
+
+# Share of a passage's words that must already be present for it to count as a duplicate
+RAG_DUPLICATE_OVERLAP = 0.8
+WORD = re.compile(r'\w+')
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r'google_key.json'
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
+if PINECONE_API_KEY:
+    os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 
 google_translate = translate_v2.Client()
-pc = Pinecone(api_key=PINECONE_API_KEY, pool_threads=30)
+pc = Pinecone(api_key=PINECONE_API_KEY, pool_threads=POOL_SIZE) if PINECONE_API_KEY else None
 client = OpenAI()
+async_client = AsyncOpenAI()
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="query-stage")
+
+
+def make_http_session(pool_size=POOL_SIZE, retry=None):
+    """requests.Session with a keep-alive connection pool and retries on transient errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        max_retries=retry or Retry(total=2, backoff_factor=0.2, status_forcelist=(429, 502, 503, 504),
+                                   allowed_methods=None),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+hf_session = make_http_session()
+
+translation_cache = TieredCache(
+    "translate",
+    max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES,
+    ttl=settings.TRANSLATION_CACHE_TTL,
+)
+
+# Keyed on the pre-processed PCM rather than the encoded upload: Ogg streams
+# get a random serial number, so the same audio never encodes to the same bytes
+transcription_cache = TieredCache(
+    "transcription",
+    max_entries=settings.TRANSCRIPTION_CACHE_MAX_ENTRIES,
+    ttl=settings.TRANSCRIPTION_CACHE_TTL,
+)
+
+# Vectors are kept as float32 bytes: 4 bytes per dimension in Redis and in memory
+embedding_cache = TieredCache(
+    "embedding",
+    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl=settings.EMBEDDING_CACHE_TTL,
+    dumps=lambda vector: vector.tobytes(),
+    loads=lambda raw: np.frombuffer(raw, dtype=np.float32),
+)
 
 
 class HFEmbeddings(Embeddings):
 
-    def __init__(self):
+    def __init__(self, session=None, cache=embedding_cache):
+        self.session = session or hf_session
+        # None sends every document to the endpoint (used for baseline benchmarks)
+        self.cache = cache
         self.hf_api_url = HF_API_URL_KK
         self.headers = {
             "Accept": "application/json",
@@ -43,90 +135,375 @@ class HFEmbeddings(Embeddings):
         }
 
     def query(self, payload):
-        response = requests.post(self.hf_api_url, headers=self.headers, json=payload)
+        response = self.session.post(self.hf_api_url, headers=self.headers, json=payload, timeout=HF_TIMEOUT)
         return response.json()
 
     def embed_documents(self, documents: list[str]):
-        response = self.query({"inputs": documents})
-        try:
-            return response['embeddings']
-        except:
-            raise Exception(f'Error in response: {response}')
+        keys = [make_key(self.hf_api_url, normalize_text(document)) for document in documents]
+        vectors = self.cache.get_many(keys) if self.cache is not None else {}
+
+        missing = {}
+        for key, document in zip(keys, documents):
+            if key not in vectors:
+                missing.setdefault(key, document)
+        if missing:
+            response = self.query({"inputs": list(missing.values())})
+            try:
+                embeddings = response['embeddings']
+            except:
+                raise Exception(f'Error in response: {response}')
+            fresh = {
+                key: np.asarray(embedding, dtype=np.float32)
+                for key, embedding in zip(missing.keys(), embeddings)
+            }
+            if self.cache is not None:
+                self.cache.set_many(fresh)
+            vectors.update(fresh)
+
+        return [vectors[key].tolist() for key in keys]
 
     def embed_query(self, query: str):
         return self.embed_documents([query])[0]
 
 
 def translate(sl: str, tl: str, text: str):
-    return google_translate.translate(
-        text, source_language=sl, target_language=tl
-    )['translatedText']
+    return translate_batch(sl, tl, [text])[0]
 
 
-def retrieve_context(text_query, namespace="8_kazakh-language-and-literature"):
-    """Retrieve context from the vector store."""
-    vectorstore = PineconeVectorStore(
+def translate_batch(sl: str, tl: str, texts: list[str]):
+    """
+    Translate many strings with as few Google calls as possible.
+    Cached strings are served from the translation cache, the remaining unique
+    strings are sent in chunks (concurrently when there is more than one chunk).
+    The result has the same order and length as ``texts``.
+    """
+    # Normalized text only builds the key; the original (line breaks included) is what gets translated
+    keys = [make_key(sl, tl, normalize_text(text)) for text in texts]
+    translations = translation_cache.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in translations:
+            missing.setdefault(key, text)
+    if missing:
+        missing_keys = list(missing)
+        chunks = [missing_keys[i:i + TRANSLATE_BATCH_SIZE] for i in range(0, len(missing_keys), TRANSLATE_BATCH_SIZE)]
+
+        def translate_chunk(chunk):
+            results = google_translate.translate([missing[key] for key in chunk], source_language=sl,
+                                                 target_language=tl)
+            return [result['translatedText'] for result in results]
+
+        if len(chunks) == 1:
+            translated_chunks = [translate_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), TRANSLATE_MAX_CONCURRENCY)) as executor:
+                translated_chunks = list(executor.map(translate_chunk, chunks))
+
+        fresh = {}
+        for chunk, translated_chunk in zip(chunks, translated_chunks):
+            fresh.update(zip(chunk, translated_chunk))
+        translation_cache.set_many(fresh)
+        translations.update(fresh)
+
+    return [translations[key] for key in keys]
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_index():
+    return LocalVectorIndex(settings.LOCAL_VECTOR_INDEX_DIR, HFEmbeddings())
+
+
+@functools.lru_cache(maxsize=None)
+def get_vectorstore(index_name=PINECONE_INDEX_NAME, namespace=None):
+    """
+    Process-wide vector store handle per (index, namespace), sharing the pooled clients.
+    VECTOR_BACKEND selects Pinecone, the local index, or "auto" (local when the
+    namespace has been exported to LOCAL_VECTOR_INDEX_DIR, Pinecone otherwise).
+    """
+    backend = settings.VECTOR_BACKEND
+    if backend == "local" or (backend == "auto" and get_local_index().has_namespace(namespace)):
+        return get_local_index()
+    return PineconeVectorStore(
+        index=pc.Index(index_name),
         embedding=HFEmbeddings(),
         text_key='text',
-        index_name='wonk-kk',
+        namespace=namespace,
     )
-    documents = vectorstore.similarity_search(
+
+
+def retrieve_passages(text_query, namespace="8_kazakh-language-and-literature"):
+    """Retrieve the top passages for a query as ``(text, score)`` pairs, best first."""
+    documents = get_vectorstore(PINECONE_INDEX_NAME, namespace).similarity_search_with_score(
         text_query,
         k=5,
         namespace=namespace
     )
-    result = "\n\n".join([document.page_content for document in documents])
-    return result
+    return [(document.page_content, score) for document, score in documents]
 
 
-def query_api(user, prompt_kk="", path_to_audio="audio.mp3", use_context=False):
-    if not prompt_kk:
-        if not path_to_audio:
-            raise "Either prompt_kk or path_to_audio must be provided."
-        audio_file = open(path_to_audio, "rb")
-        prompt_kk = client.audio.translations.create(
-            model="whisper-1",
-            file=audio_file
-        ).text
-
-    if not os.path.exists(f'{user.id}.pickle'):
-        with open('query_prompt.txt', 'r') as file:
-            system_message_content = file.read()
-        system_message_content = system_message_content \
-            .replace('$$name$$', user.name) \
-            .replace('$$surname$$', user.surname) \
-            .replace('$$age$$', str(user.age))
-        messages = [{"role": "system", "content": system_message_content}]
-    else:
-        with open(f'{user.id}.pickle', 'rb') as file:
-            messages = pickle.load(file)
+def select_context(passages, recent_messages=()):
+    """
+    Choose which retrieved passages go into this turn's prompt. Passages below
+    RAG_MIN_SCORE, near-duplicates of a passage already chosen, and passages
+    whose words are already in the recent dialogue are skipped, and at most
+    RAG_CONTEXT_TOKEN_BUDGET tokens of passages are kept.
+    """
+    recent_words = set()
+    for message in recent_messages:
+        recent_words.update(WORD.findall(message["content"].lower()))
+
+    chosen, chosen_words = [], []
+    used_tokens = 0
+    for text, score in passages:
+        if score < settings.RAG_MIN_SCORE:
+            continue
+        words = set(WORD.findall(text.lower()))
+        if not words:
+            continue
+        if len(words & recent_words) / len(words) >= RAG_DUPLICATE_OVERLAP:
+            continue
+        if any(len(words & other) / len(words | other) >= RAG_DUPLICATE_OVERLAP for other in chosen_words):
+            continue
+        tokens = count_tokens(text, CHAT_MODEL)
+        if used_tokens + tokens > settings.RAG_CONTEXT_TOKEN_BUDGET:
+            continue
+        chosen.append(text)
+        chosen_words.append(words)
+        used_tokens += tokens
+    return "\n\n".join(chosen)
 
-    if use_context:
-        context = retrieve_context(prompt_kk)
-        messages[0]["content"] += context
 
-    prompt_en = translate('kk', 'en', prompt_kk)
+def retrieve_context(text_query, namespace="8_kazakh-language-and-literature"):
+    """Retrieve context from the vector store."""
+    return select_context(retrieve_passages(text_query, namespace))
+
+
+def transcribe_part(part):
+    return client.audio.translations.create(
+        model=TRANSCRIBE_MODEL,
+        file=part
+    ).text
+
+
+def lookup_transcriptions(audio, filename):
+    """
+    Pre-process an upload and look its chunks up in the transcription cache.
+    Returns the cache keys in order, the cached texts and the encoded uploads
+    of the chunks still to transcribe.
+    """
+    chunks = speech_chunks(
+        audio, filename, settings.AUDIO_MAX_DURATION_SECONDS * 1000, settings.AUDIO_CHUNK_SECONDS * 1000
+    )
+    keys = [make_key(TRANSCRIBE_MODEL, hashlib.sha256(chunk.raw_data).hexdigest()) for chunk in chunks]
+    texts = transcription_cache.get_many(keys)
+    missing = {key: as_upload(chunk) for key, chunk in zip(keys, chunks) if key not in texts}
+    logger.debug("Transcription cache: %s", transcription_cache.stats())
+    return keys, texts, missing
+
+
+def transcribe(audio, filename):
+    """
+    Translate a spoken prompt to English text. Long recordings are split at
+    pauses and the chunks are transcribed concurrently; chunks heard before
+    are served from the transcription cache.
+    """
+    keys, texts, missing = lookup_transcriptions(audio, filename)
+    if missing:
+        uploads = list(missing.values())
+        if len(uploads) == 1:
+            results = [transcribe_part(uploads[0])]
+        else:
+            results = stage_executor.map(transcribe_part, uploads)
+        fresh = dict(zip(missing, results))
+        transcription_cache.set_many(fresh)
+        texts.update(fresh)
+    return " ".join(texts[key] for key in keys)
+
+
+def build_system_prompt(user):
+    return prompt_registry.get('query_prompt.txt').render(name=user.name, surname=user.surname, age=user.age)
+
+
+def load_conversation(chat_id):
+    """Return ``(history, summary, summary_upto)`` for a chat."""
+    history = conversation_store.load(chat_id)
+    summary, summary_upto = conversation_store.load_summary(chat_id) if history else ("", 0)
+    return history, summary, summary_upto
+
+
+def assemble_messages(system_message_content, conversation, prompt_en, passages=()):
+    """
+    Build the messages for one completion. Retrieved context only ever lives in
+    this turn's copy of the system prompt; it is never saved with the history.
+    """
+    history, summary, summary_upto = conversation
+    window = build_window(history, summary, summary_upto)
+    context = select_context(passages, window)
+    messages = [{"role": "system", "content": system_message_content + context}]
+    messages += window
     messages.append({"role": "user", "content": prompt_en})
+    return messages
+
+
+def run_stages(stages, inline=None, timings=None):
+    """
+    Run independent zero-argument callables concurrently and return their results by name.
+    The ``inline`` stage runs on the calling thread (use it for ORM work), the
+    rest on the shared stage pool. Per-stage wall times in milliseconds are
+    written to ``timings`` when it is given.
+    """
+    def timed(stage):
+        start = time.perf_counter()
+        result = stage()
+        return result, (time.perf_counter() - start) * 1000
+
+    futures = {
+        name: stage_executor.submit(timed, stage)
+        for name, stage in stages.items() if name != inline
+    }
+    outcomes = {inline: timed(stages[inline])} if inline else {}
+    for name, future in futures.items():
+        outcomes[name] = future.result()
+
+    if timings is not None:
+        timings.update({name: round(elapsed, 1) for name, (_, elapsed) in outcomes.items()})
+    return {name: result for name, (result, _) in outcomes.items()}
+
+
+def prepare_turn(user, prompt_kk, use_context=False, timings=None):
+    """
+    Build the chat completion messages for a new student prompt. Returns (messages, prompt_en).
+    History, retrieval and prompt translation only depend on the prompt, so they
+    run concurrently and the turn waits for the slowest of them.
+    """
+    stages = {
+        "history": lambda: load_conversation(user.id),
+        "system_prompt": lambda: build_system_prompt(user),
+        "translate_prompt": lambda: translate('kk', 'en', prompt_kk),
+    }
+    if use_context:
+        stages["retrieval"] = lambda: retrieve_passages(prompt_kk)
+    results = run_stages(stages, inline="history", timings=timings)
+
+    messages = assemble_messages(
+        results["system_prompt"], results["history"], results["translate_prompt"], results.get("retrieval", ())
+    )
+    return messages, results["translate_prompt"]
+
+
+def finish_turn(user, prompt_en, full_response_en):
+    conversation_store.append(
+        user.id,
+        {"role": "user", "content": prompt_en},
+        {"role": "assistant", "content": full_response_en},
+    )
+
+    history, summary, summary_upto = load_conversation(user.id)
+    start = window_start(history, settings.CHAT_HISTORY_TOKEN_BUDGET, CHAT_MODEL)
+    if start - summary_upto >= settings.CHAT_SUMMARY_MIN_MESSAGES:
+        from .tasks import summarize_conversation
+        summarize_conversation.delay(user.id)
+
+
+def summarize_conversation_history(chat_id):
+    """Fold the messages that no longer fit in the history window into the chat's rolling summary."""
+    history, summary, summary_upto = load_conversation(chat_id)
+    start = window_start(history, settings.CHAT_HISTORY_TOKEN_BUDGET, CHAT_MODEL)
+    if start <= summary_upto:
+        return False
+
+    evicted = get_dialogue_transcript(history[summary_upto:start])
+    response = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": prompt_registry.get('summary_prompt.txt').text},
+            {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{evicted}"},
+        ],
+        temperature=0,
+        max_tokens=SUMMARY_MAX_TOKENS,
+    )
+    return conversation_store.save_summary(
+        chat_id, response.choices[0].message.content, start, expected_upto=summary_upto
+    )
+
+
+def query_api(user, prompt_kk="", audio=None, audio_name="audio.webm", use_context=False):
+    if not prompt_kk:
+        if audio is None:
+            raise ValueError("Either prompt_kk or audio must be provided.")
+        prompt_kk = transcribe(audio, audio_name)
+
+    timings = {}
+    start = time.perf_counter()
+    messages, prompt_en = prepare_turn(user, prompt_kk, use_context, timings=timings)
+    timings["prepare"] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
     response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
+        model=CHAT_MODEL,
         messages=messages,
-        temperature=0.5,
-        max_tokens=512,
+        **CHAT_PARAMS,
     )
+    timings["completion"] = round((time.perf_counter() - start) * 1000, 1)
 
     full_response_en = response.choices[0].message.content
-    messages.append({"role": "assistant", "content": full_response_en})
-
-    if len(messages) > 10:
-        messages = messages[:1] + messages[-1:]
-    with open(f'{user.id}.pickle', 'wb') as file:
-        pickle.dump(messages, file)
+    finish_turn(user, prompt_en, full_response_en)
 
+    start = time.perf_counter()
     full_response_kk = translate('en', 'kk', full_response_en)
+    timings["translate_response"] = round((time.perf_counter() - start) * 1000, 1)
 
+    logger.info("query_api chat=%s stage timings (ms): %s", user.id, timings)
     return full_response_kk
 
 
+def split_sentences(text):
+    """Split off the complete sentences of ``text``. Returns (sentences, remainder)."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    return sentences, text[start:]
+
+
+def query_api_stream(user, prompt_kk="", audio=None, audio_name="audio.webm", use_context=False):
+    """
+    Streaming variant of ``query_api``: yields the Kazakh answer one sentence at
+    a time as the model produces it. The turn is saved once the stream ends.
+    """
+    if not prompt_kk:
+        if audio is None:
+            raise ValueError("Either prompt_kk or audio must be provided.")
+        prompt_kk = transcribe(audio, audio_name)
+
+    messages, prompt_en = prepare_turn(user, prompt_kk, use_context)
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        stream=True,
+        **CHAT_PARAMS,
+    )
+
+    parts = []
+    pending = ""
+    for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        delta = chunk.choices[0].delta.content
+        parts.append(delta)
+        sentences, pending = split_sentences(pending + delta)
+        for sentence in sentences:
+            yield translate('en', 'kk', sentence)
+    if pending.strip():
+        yield translate('en', 'kk', pending.strip())
+
+    finish_turn(user, prompt_en, "".join(parts))
+
+
 def get_dialogue_transcript(messages):
     dialogue = ""
     for message in messages:
@@ -138,81 +515,19 @@ def get_dialogue_transcript(messages):
 
 
 def analyze_dialogue(user):
-    if not os.path.exists(f'{user.id}.pickle'):
-        raise "No dialogue found for this user."
+    messages = conversation_store.load(user.id)
+    if not messages:
+        raise ValueError("No dialogue found for this user.")
 
-    with open(f'{user.id}.pickle', 'rb') as file:
-        messages = pickle.load(file)
+    response = client.chat.completions.create(**analysis_request(messages))
+    return parse_analysis(response)
 
-    dialogue = get_dialogue_transcript(messages)
 
-    tools = [{
-        "type": "function",
-        "function": {
-            "name": "analyse_speech_transcript",
-            "description": "Analyze the dialogue in terms of grammar, vocabulary, and meaning.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "vocabulary": {
-                        "type": "object",
-                        "properties": {
-                            "comments": {
-                                "type": "array",
-                                "items": {
-                                    "type": "string"
-                                },
-                                "description": "List with all comments on vocabulary"
-                            },
-                            "score": {
-                                "type": "integer",
-                                "description": "Evaluation of the vocabulary"
-                            }
-                        },
-                        "description": "This parameter evaluates how well the student uses the words and phrases of language X. It checks if the student is using contextually appropriate vocabulary and whether or not he/she is able to correctly use a wide range of vocabulary. "
-                    },
-                    "communication_effectiveness": {
-                        "type": "object",
-                        "properties": {
-                            "comments": {
-                                "type": "array",
-                                "items": {
-                                    "type": "string"
-                                },
-                                "description": "List with all comments on communication effectiveness"
-                            },
-                            "score": {
-                                "type": "integer",
-                                "description": "Evaluation of the communication effectiveness"
-                            }
-                        },
-                        "description": "This parameter estimates how well the student can convey his/her thoughts, ideas, or feelings in language X. It does not just concentrate on correctness but also on the ability to express oneself clearly and understandably."
-                    },
-                    "contextual_understanding": {
-                        "type": "object",
-                        "properties": {
-                            "comments": {
-                                "type": "array",
-                                "items": {
-                                    "type": "string"
-                                },
-                                "description": "List with all comments on contextual understanding"
-                            },
-                            "score": {
-                                "type": "integer",
-                                "description": "Evaluation of the contextual understanding"
-                            }
-                        },
-                        "description": "This parameter evaluates the student's ability to understand and appropriately respond to the situational context of the conversation. It checks if the student can understand indirect speech, sarcasm, idioms, and cultural references in language X. "
-                    }
-                },
-                "required": ["vocabulary", "communication_effectiveness", "contextual_understanding"]
-            }
-        }
-    }]
+def analysis_request(messages):
+    """Keyword arguments for the chat completion that grades a dialogue."""
+    dialogue = get_dialogue_transcript(messages)
 
-    with open('analyze_prompt.txt', 'r', encoding="utf-8") as file:
-        system_message_content = file.read()
+    system_message_content = prompt_registry.get('analyze_prompt.txt').text
 
     messages = [
         {"role": "system", "content": system_message_content},
@@ -220,24 +535,29 @@ def analyze_dialogue(user):
          "content": f"Hi! Here is my dialogue with my teacher. Please analyze it and write comments on how to improve my English. Try to write at least 1-2 comments in each parameter with detailed explanations (the more is better). I will tip you 200$. Thank you!\n\n{dialogue}"}
     ]
 
-    response = client.chat.completions.create(
+    return dict(
         model="gpt-4-turbo",
         messages=messages,
         temperature=0,
-        tools=tools,
-        tool_choice={"type": "function", "function": {"name": "analyse_speech_transcript"}},
+        tools=thaw(ANALYSIS_TOOLS),
+        tool_choice=thaw(ANALYSIS_TOOL_CHOICE),
         max_tokens=2048,
     )
 
+
+def parse_analysis(response):
+    """Decode the dialogue analysis and translate its comments to Kazakh."""
     comments = response.choices[0].message.tool_calls[0].function.arguments
     d = json.loads(comments)
 
+    comments_en = [
+        comment.replace('English', 'Kazakh').replace('english', 'kazakh')
+        for key in d.keys()
+        for comment in d[key]['comments']
+    ]
+    comments_kk = iter(translate_batch('en', 'kk', comments_en))
     for key in d.keys():
-        for i in range(len(d[key]['comments'])):
-            comment = d[key]['comments'][i]
-            comment.replace('English', 'Kazakh').replace('english', 'kazakh')
-            translated_comment = translate('en', 'kk', comment)
-            d[key]['comments'][i] = translated_comment
+        d[key]['comments'] = [next(comments_kk) for _ in d[key]['comments']]
 
     return d
 
@@ -263,44 +583,19 @@ def check_reading_answers(answers_kk, questions, text):
     """
 
     # translate all answers to english
-    answers_en = [translate('kk', 'en', answer) for answer in answers_kk]
+    answers_en = translate_batch('kk', 'en', answers_kk)
+
+    response = client.chat.completions.create(**reading_request(answers_en, questions, text))
+    return parse_reading(response)
+
 
+def reading_request(answers_en, questions, text):
+    """Keyword arguments for the chat completion that grades reading answers."""
     qna = ""
     for question, answer in zip(questions, answers_en):
         qna += f"Question: {question}\nAnswer: {answer}\n\n"
 
-    tools = [{
-        "type": "function",
-        "function": {
-            "name": "check_reading_answers",
-            "description": "Analyze the answers to the reading task. How much of the text was understood?",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "comments": {
-                        "type": "array",
-                        "items": {
-                            "type": "string"
-                        },
-                        "description": "List with all comments on the answers"
-                    },
-                    "scores": {
-                        "type": "array",
-                        "items": {
-                            "type": "integer"
-                        },
-                        "description": "This parameter evaluates how well the student can answer the questions based on the text. It checks if the student can understand the text and answer the questions correctly. It's value is either 1 or 0."
-                    }
-                },
-                "required": ["comments", "scores"]
-            }
-        }
-    }]
-
-    with open('reading_prompt.txt', 'r', encoding="utf-8") as file:
-        system_message_content = file.read()
-
-    system_message_content += "\n\n" + text
+    system_message_content = prompt_registry.get('reading_prompt.txt').text + "\n\n" + text
 
     messages = [
         {"role": "system", "content": system_message_content},
@@ -308,28 +603,127 @@ def check_reading_answers(answers_kk, questions, text):
          "content": f"Hi! Here are my answers to the reading task. Please analyze them, evaluate and write comments on each of my answer. will tip you 200$. Thank you!\n\n{qna}"}
     ]
 
-    response = client.chat.completions.create(
+    return dict(
         model="gpt-4-turbo",
         messages=messages,
         temperature=0,
-        tools=tools,
-        tool_choice={"type": "function", "function": {"name": "check_reading_answers"}},
+        tools=thaw(READING_TOOLS),
+        tool_choice=thaw(READING_TOOL_CHOICE),
         max_tokens=2048,
     )
 
+
+def parse_reading(response):
+    """Decode the reading evaluation and translate its comments to Kazakh."""
     comments = response.choices[0].message.tool_calls[0].function.arguments
 
     d = json.loads(comments)
 
-    for i in range(len(d['comments'])):
-        comment = d['comments'][i]
+    d['comments'] = translate_batch('en', 'kk', [
         comment.replace('English', 'Kazakh').replace('english', 'kazakh')
-        translated_comment = translate('en', 'kk', comment)
-        d['comments'][i] = translated_comment
+        for comment in d['comments']
+    ])
 
     return d
 
 
+# Async variants for the ASGI views. Network-bound helpers that have no async
+# client run in worker threads (thread_sensitive=False) so they overlap; ORM
+# access goes through the default thread-sensitive executor.
+
+async def atranscribe(audio, filename):
+    keys, texts, missing = await sync_to_async(lookup_transcriptions, thread_sensitive=False)(audio, filename)
+    if missing:
+        transcriptions = await asyncio.gather(*[
+            async_client.audio.translations.create(model=TRANSCRIBE_MODEL, file=upload)
+            for upload in missing.values()
+        ])
+        fresh = {key: transcription.text for key, transcription in zip(missing, transcriptions)}
+        await sync_to_async(transcription_cache.set_many, thread_sensitive=False)(fresh)
+        texts.update(fresh)
+    return " ".join(texts[key] for key in keys)
+
+
+async def aprepare_turn(user, prompt_kk, use_context=False):
+    async def no_passages():
+        return ()
+
+    system_message_content, history, passages, prompt_en = await asyncio.gather(
+        sync_to_async(build_system_prompt, thread_sensitive=False)(user),
+        sync_to_async(load_conversation)(user.id),
+        sync_to_async(retrieve_passages, thread_sensitive=False)(prompt_kk) if use_context else no_passages(),
+        sync_to_async(translate, thread_sensitive=False)('kk', 'en', prompt_kk),
+    )
+    return assemble_messages(system_message_content, history, prompt_en, passages), prompt_en
+
+
+async def aquery_api(user, prompt_kk="", audio=None, audio_name="audio.webm", use_context=False):
+    if not prompt_kk:
+        if audio is None:
+            raise ValueError("Either prompt_kk or audio must be provided.")
+        prompt_kk = await atranscribe(audio, audio_name)
+
+    messages, prompt_en = await aprepare_turn(user, prompt_kk, use_context)
+    response = await async_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        **CHAT_PARAMS,
+    )
+
+    full_response_en = response.choices[0].message.content
+    await sync_to_async(finish_turn)(user, prompt_en, full_response_en)
+
+    return await sync_to_async(translate, thread_sensitive=False)('en', 'kk', full_response_en)
+
+
+async def aquery_api_stream(user, prompt_kk="", audio=None, audio_name="audio.webm", use_context=False):
+    """Async counterpart of ``query_api_stream``, for streaming responses served under ASGI."""
+    if not prompt_kk:
+        if audio is None:
+            raise ValueError("Either prompt_kk or audio must be provided.")
+        prompt_kk = await atranscribe(audio, audio_name)
+
+    messages, prompt_en = await aprepare_turn(user, prompt_kk, use_context)
+    stream = await async_client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        stream=True,
+        **CHAT_PARAMS,
+    )
+
+    atranslate = sync_to_async(translate, thread_sensitive=False)
+    parts = []
+    pending = ""
+    async for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        delta = chunk.choices[0].delta.content
+        parts.append(delta)
+        sentences, pending = split_sentences(pending + delta)
+        for sentence in sentences:
+            yield await atranslate('en', 'kk', sentence)
+    if pending.strip():
+        yield await atranslate('en', 'kk', pending.strip())
+
+    await sync_to_async(finish_turn)(user, prompt_en, "".join(parts))
+
+
+async def aanalyze_dialogue(user):
+    messages = await sync_to_async(conversation_store.load)(user.id)
+    if not messages:
+        raise ValueError("No dialogue found for this user.")
+
+    response = await async_client.chat.completions.create(**analysis_request(messages))
+    return await sync_to_async(parse_analysis, thread_sensitive=False)(response)
+
+
+async def acheck_reading_answers(answers_kk, questions, text):
+    answers_en = await sync_to_async(translate_batch, thread_sensitive=False)('kk', 'en', answers_kk)
+
+    response = await async_client.chat.completions.create(**reading_request(answers_en, questions, text))
+    return await sync_to_async(parse_reading, thread_sensitive=False)(response)
+
+
 # if __name__ == '__main__':
     # user = User(1, 'John', 'Doe', 25)
     # prompt_kk = "Қотақ сорғың келе ма?"
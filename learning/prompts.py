@@ -0,0 +1,197 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+
+PLACEHOLDER = re.compile(r'\$\$(\w+)\$\$')
+
+
+class PromptTemplate:
+    """A prompt file split once into literal text and ``$$name$$`` placeholders."""
+
+    def __init__(self, text):
+        self.text = text
+        self.content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        parts = PLACEHOLDER.split(text)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+
+    def render(self, **values):
+        rendered = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            rendered.append(str(values[name]))
+            rendered.append(literal)
+        return "".join(rendered)
+
+
+class PromptRegistry:
+    """
+    Prompt templates loaded once and kept in memory. A file is re-read when its
+    mtime changes; the mtime is checked at most once per ``check_interval`` seconds.
+    """
+
+    def __init__(self, directory, names, check_interval=1.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._templates = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self._load(name)
+
+    def _load(self, name):
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, 'r', encoding="utf-8") as file:
+            template = PromptTemplate(file.read())
+        self._templates[name] = (template, mtime, time.monotonic())
+        return template
+
+    def get(self, name):
+        entry = self._templates.get(name)
+        if entry is None:
+            with self._lock:
+                return self._load(name)
+
+        template, mtime, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at < self.check_interval:
+            return template
+        with self._lock:
+            if os.stat(os.path.join(self.directory, name)).st_mtime_ns != mtime:
+                return self._load(name)
+            self._templates[name] = (template, mtime, now)
+            return template
+
+    def content_hash(self, name):
+        return self.get(name).content_hash
+
+
+prompt_registry = PromptRegistry(
+    settings.BASE_DIR,
+    ['query_prompt.txt', 'analyze_prompt.txt', 'reading_prompt.txt', 'summary_prompt.txt'],
+    check_interval=settings.PROMPT_RELOAD_INTERVAL,
+)
+
+
+def freeze(value):
+    """Read-only copy of a JSON-like value: dicts become mapping proxies and lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Plain dict/list copy of a frozen value, for clients that serialize only those."""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+# Function-calling schemas, built once at import and frozen so no request can
+# change them for the next one.
+
+ANALYSIS_TOOLS = freeze([{
+    "type": "function",
+    "function": {
+        "name": "analyse_speech_transcript",
+        "description": "Analyze the dialogue in terms of grammar, vocabulary, and meaning.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "vocabulary": {
+                    "type": "object",
+                    "properties": {
+                        "comments": {
+                            "type": "array",
+                            "items": {
+                                "type": "string"
+                            },
+                            "description": "List with all comments on vocabulary"
+                        },
+                        "score": {
+                            "type": "integer",
+                            "description": "Evaluation of the vocabulary"
+                        }
+                    },
+                    "description": "This parameter evaluates how well the student uses the words and phrases of language X. It checks if the student is using contextually appropriate vocabulary and whether or not he/she is able to correctly use a wide range of vocabulary. "
+                },
+                "communication_effectiveness": {
+                    "type": "object",
+                    "properties": {
+                        "comments": {
+                            "type": "array",
+                            "items": {
+                                "type": "string"
+                            },
+                            "description": "List with all comments on communication effectiveness"
+                        },
+                        "score": {
+                            "type": "integer",
+                            "description": "Evaluation of the communication effectiveness"
+                        }
+                    },
+                    "description": "This parameter estimates how well the student can convey his/her thoughts, ideas, or feelings in language X. It does not just concentrate on correctness but also on the ability to express oneself clearly and understandably."
+                },
+                "contextual_understanding": {
+                    "type": "object",
+                    "properties": {
+                        "comments": {
+                            "type": "array",
+                            "items": {
+                                "type": "string"
+                            },
+                            "description": "List with all comments on contextual understanding"
+                        },
+                        "score": {
+                            "type": "integer",
+                            "description": "Evaluation of the contextual understanding"
+                        }
+                    },
+                    "description": "This parameter evaluates the student's ability to understand and appropriately respond to the situational context of the conversation. It checks if the student can understand indirect speech, sarcasm, idioms, and cultural references in language X. "
+                }
+            },
+            "required": ["vocabulary", "communication_effectiveness", "contextual_understanding"]
+        }
+    }
+}])
+
+
+READING_TOOLS = freeze([{
+    "type": "function",
+    "function": {
+        "name": "check_reading_answers",
+        "description": "Analyze the answers to the reading task. How much of the text was understood?",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "comments": {
+                    "type": "array",
+                    "items": {
+                        "type": "string"
+                    },
+                    "description": "List with all comments on the answers"
+                },
+                "scores": {
+                    "type": "array",
+                    "items": {
+                        "type": "integer"
+                    },
+                    "description": "This parameter evaluates how well the student can answer the questions based on the text. It checks if the student can understand the text and answer the questions correctly. It's value is either 1 or 0."
+                }
+            },
+            "required": ["comments", "scores"]
+        }
+    }
+}])
+
+ANALYSIS_TOOL_CHOICE = freeze({"type": "function", "function": {"name": "analyse_speech_transcript"}})
+
+READING_TOOL_CHOICE = freeze({"type": "function", "function": {"name": "check_reading_answers"}})
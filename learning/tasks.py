@@ -1,8 +1,157 @@
+import json
+import logging
+import uuid
+
 from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+import openai
+import redis
 import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.retry import Retry
+
+from .cache import get_redis, make_key
+from .models import Experience, GPTReport
+from .open import User, analyze_dialogue, make_http_session, summarize_conversation_history
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive pool per worker process, shared by all of its greenlets. A
+# synthesis request is not idempotent (a repeat is spoken twice), so only
+# failures to connect are retried, never read timeouts or error responses.
+tts_session = make_http_session(
+    pool_size=settings.TTS_POOL_SIZE,
+    retry=Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.2),
+)
+
+# Only the start of the synthesizer's reply is kept in the result backend
+TTS_RESULT_MAX_CHARS = 200
+
+
+def _tts_keys(url):
+    key = make_key(url)
+    return f"tts:{key}:pending", f"tts:{key}:flush"
 
 
-@shared_task
+def never_sent(exc):
+    """True when a request failed before the synthesizer could have received it."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        return isinstance(getattr(exc.args[0], "reason", None), (NewConnectionError, ConnectTimeoutError))
+    return False
+
+
+def merge_payloads(payloads):
+    """Fold queued payloads into one request: texts joined in order, repeats dropped."""
+    texts = list(dict.fromkeys(payload["text"] for payload in payloads if payload.get("text")))
+    merged = dict(payloads[-1])
+    merged["text"] = " ".join(texts)
+    return merged
+
+
+@shared_task(ignore_result=True)
 def post_text_to_service(url, data):
-    response = requests.post(url, json=data)
-    return response.status_code, response.text
+    """
+    Queue ``data`` for the synthesizer at ``url``. Messages arriving within
+    TTS_COALESCE_SECONDS of each other are sent as one request by
+    ``flush_text_to_service``; without Redis the message is sent on its own.
+    """
+    pending_key, flush_key = _tts_keys(url)
+    try:
+        connection = get_redis()
+        # Push before claiming the flush so a concurrent flush can never strand the message
+        pipe = connection.pipeline()
+        pipe.rpush(pending_key, json.dumps(data))
+        pipe.expire(pending_key, settings.TTS_PENDING_TTL)
+        pipe.execute()
+        schedule = connection.set(flush_key, 1, nx=True, ex=settings.TTS_PENDING_TTL)
+    except redis.RedisError as e:
+        logger.warning("Could not queue text for %s: %s", url, e)
+        flush_text_to_service.delay(url, data)
+        return
+    if schedule:
+        flush_text_to_service.apply_async((url,), countdown=settings.TTS_COALESCE_SECONDS)
+
+
+@shared_task(bind=True, max_retries=3)
+def flush_text_to_service(self, url, payload=None):
+    """Send everything queued for ``url`` as a single request (or ``payload`` when retrying)."""
+    if payload is None:
+        pending_key, flush_key = _tts_keys(url)
+        pipe = get_redis().pipeline()
+        pipe.lrange(pending_key, 0, -1)
+        pipe.delete(pending_key, flush_key)
+        raw, _ = pipe.execute()
+        if not raw:
+            return None
+        payload = merge_payloads([json.loads(item) for item in raw])
+    # Let the synthesizer answer 202 at once instead of holding the request open until playback ends
+    payload.setdefault("wait", False)
+
+    try:
+        response = tts_session.post(url, json=payload, timeout=settings.TTS_REQUEST_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if not never_sent(e):
+            # The synthesizer may already be speaking it; sending it again could repeat the reply
+            logger.warning("Speech synthesis request to %s failed: %s", url, e)
+            return None
+        # Retry with the merged payload: the queue it came from is already drained
+        raise self.retry(exc=e, args=(url, payload), countdown=2 ** self.request.retries)
+    return response.status_code, response.text[:TTS_RESULT_MAX_CHARS]
+
+
+def save_report(user, result):
+    """Store a dialogue analysis and award experience for its scores."""
+    report = GPTReport.objects.create(user=user, report_data=result)
+    experience, created = Experience.objects.get_or_create(user=user)
+    experience.add_report_scores(result)
+    return report
+
+
+@shared_task(
+    autoretry_for=(openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                   openai.InternalServerError),
+    retry_backoff=True,
+    retry_backoff_max=120,
+    max_retries=3,
+    soft_time_limit=settings.REPORT_TASK_SOFT_TIME_LIMIT,
+    time_limit=settings.REPORT_TASK_TIME_LIMIT,
+)
+def generate_report(user_id, chat_id):
+    user = AuthUser.objects.get(id=user_id)
+    chat = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
+    result = analyze_dialogue(chat)
+    report = save_report(user, result)
+    return {"report_id": report.id, "user_id": user_id}
+
+
+@shared_task(
+    autoretry_for=(openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                   openai.InternalServerError),
+    retry_backoff=True,
+    max_retries=3,
+)
+def summarize_conversation(chat_id):
+    return summarize_conversation_history(chat_id)
+
+
+# Celery keeps results for a day by default; the owner record lives as long
+REPORT_JOB_TTL = 24 * 3600
+
+
+def queue_report(user_id, chat_id):
+    """Start ``generate_report`` for ``user_id`` and record who owns the job. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    # Recorded before queueing so the job can never be polled without an owner
+    get_redis().set(f"report-job:{job_id}", user_id, ex=REPORT_JOB_TTL)
+    generate_report.apply_async((user_id, chat_id), task_id=job_id)
+    return job_id
+
+
+def report_job_owner(job_id):
+    """Id of the user who queued the report job, or None for unknown or expired ids."""
+    owner = get_redis().get(f"report-job:{job_id}")
+    return int(owner) if owner is not None else None
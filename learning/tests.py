@@ -1,3 +1,263 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+import redis
+from django.contrib.auth.models import User as AuthUser
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+from pydub.generators import Sine
+
+from .audio import AudioUnreadable, decode, split_at_silence
+from .cache import TieredCache
+from .conversation import ConversationStore
+from .models import Chat, ChatMessage
+from .open import CHAT_MODEL, select_context
+from .tasks import merge_payloads
+from .window import build_window, message_tokens, window_start
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+class FakeRedisMixin:
+    """Points every module that talks to Redis at one in-process fake server."""
+
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeRedis()
+        for target in ("learning.cache.get_redis", "learning.conversation.get_redis"):
+            patcher = mock.patch(target, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ConversationStoreTests(FakeRedisMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.chat = Chat.objects.create(user=AuthUser.objects.create(username="student"))
+        self.store = ConversationStore(lock_timeout=1)
+
+    def test_append_then_load_returns_messages_in_order(self):
+        self.store.append(self.chat.id, message("user", "Hi"), message("assistant", "Hello"))
+        self.store.append(self.chat.id, message("user", "How are you?"))
+
+        self.assertEqual([m["content"] for m in self.store.load(self.chat.id)], ["Hi", "Hello", "How are you?"])
+        self.assertEqual(list(ChatMessage.objects.filter(chat=self.chat).values_list("seq", flat=True)), [0, 1, 2])
+
+    def test_cold_load_warms_redis_and_appends_extend_it(self):
+        ChatMessage.objects.create(chat=self.chat, seq=0, role="user", content="Hi")
+        self.assertEqual(self.store.load(self.chat.id), [message("user", "Hi")])
+        self.assertEqual(self.redis.llen(self.store._key(self.chat.id)), 1)
+
+        self.store.append(self.chat.id, message("assistant", "Hello"))
+        self.assertEqual(self.redis.llen(self.store._key(self.chat.id)), 2)
+        self.assertEqual(self.store.load(self.chat.id)[-1], message("assistant", "Hello"))
+
+    def test_append_retries_when_another_writer_took_the_sequence_number(self):
+        # Another writer stored seq 0 after this one read the last sequence number
+        ChatMessage.objects.create(chat=self.chat, seq=0, role="user", content="Other")
+        real_aggregate = QuerySet.aggregate
+        calls = []
+
+        def stale_then_real(queryset, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                return {"last": None}
+            return real_aggregate(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, "aggregate", stale_then_real):
+            self.store.append(self.chat.id, message("user", "Mine"))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            list(ChatMessage.objects.filter(chat=self.chat).values_list("seq", "content")),
+            [(0, "Other"), (1, "Mine")],
+        )
+
+    def test_load_without_the_lock_does_not_warm_redis(self):
+        ChatMessage.objects.create(chat=self.chat, seq=0, role="user", content="Hi")
+        held = self.store._lock(self.chat.id)
+        held.acquire()
+        try:
+            store = ConversationStore(lock_timeout=0.1)
+            self.assertEqual(store.load(self.chat.id), [message("user", "Hi")])
+            self.assertFalse(self.redis.exists(store._key(self.chat.id)))
+        finally:
+            held.release()
+
+
+class ConversationStoreConcurrencyTests(FakeRedisMixin, TransactionTestCase):
+
+    def test_append_during_warm_up_is_not_lost(self):
+        chat = Chat.objects.create(user=AuthUser.objects.create(username="student"))
+        ChatMessage.objects.create(chat=chat, seq=0, role="user", content="Hi")
+        store = ConversationStore(lock_timeout=5)
+        real_load_durable = store._load_durable
+        writer_done = threading.Event()
+
+        def append_from_another_worker():
+            try:
+                store.append(chat.id, message("assistant", "Hello"))
+            finally:
+                connection.close()
+                writer_done.set()
+
+        def load_durable_while_another_worker_appends(chat_id):
+            rows = real_load_durable(chat_id)
+            threading.Thread(target=append_from_another_worker).start()
+            # The writer has to wait for the chat lock held by this warm-up
+            time.sleep(0.2)
+            self.assertFalse(writer_done.is_set())
+            return rows
+
+        with mock.patch.object(store, "_load_durable", side_effect=load_durable_while_another_worker_appends):
+            self.assertEqual(store.load(chat.id), [message("user", "Hi")])
+        self.assertTrue(writer_done.wait(5))
+
+        self.assertEqual(store.load(chat.id), [message("user", "Hi"), message("assistant", "Hello")])
+
+
+class TieredCacheTests(FakeRedisMixin, SimpleTestCase):
+
+    def test_values_are_served_locally_then_from_redis(self):
+        cache = TieredCache("test", max_entries=10)
+        cache.set_many({"a": "1", "b": "2"})
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": "1", "b": "2"})
+
+        other_process = TieredCache("test", max_entries=10)
+        self.assertEqual(other_process.get("a"), "1")
+        self.assertEqual(cache.stats()["local_hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(other_process.stats()["redis_hits"], 1)
+
+    def test_repeated_keys_are_counted_once(self):
+        cache = TieredCache("test", max_entries=10)
+        cache.set("a", "1")
+        self.assertEqual(cache.get_many(["a", "a", "b", "b"]), {"a": "1"})
+        stats = cache.stats()
+        self.assertEqual((stats["local_hits"], stats["misses"]), (1, 1))
+
+    def test_local_tier_is_bounded(self):
+        cache = TieredCache("test", max_entries=2)
+        for key in "abc":
+            cache.set(key, key)
+        self.assertEqual(cache.stats()["local_size"], 2)
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.stats()["redis_hits"], 1)
+
+    def test_redis_errors_count_as_misses(self):
+        cache = TieredCache("test", max_entries=10)
+        with mock.patch.object(self.redis, "mget", side_effect=redis.RedisError("down")):
+            self.assertEqual(cache.get_many(["missing"]), {})
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+# Token counts use the offline estimate so the tests never download a tiktoken encoding
+@mock.patch("learning.window.tiktoken", None)
+class WindowTests(SimpleTestCase):
+
+    def setUp(self):
+        self.history = [message("user", "one"), message("assistant", "two"),
+                        message("user", "three"), message("assistant", "four")]
+
+    def test_window_keeps_the_most_recent_turns_that_fit(self):
+        budget = sum(message_tokens(m, CHAT_MODEL) for m in self.history[2:])
+        self.assertEqual(window_start(self.history, budget, CHAT_MODEL), 2)
+        self.assertEqual(window_start(self.history, budget * 10, CHAT_MODEL), 0)
+
+    def test_window_never_opens_with_an_assistant_message(self):
+        budget = sum(message_tokens(m, CHAT_MODEL) for m in self.history[1:])
+        self.assertEqual(window_start(self.history, budget, CHAT_MODEL), 2)
+
+    def test_build_window_prepends_the_summary_and_skips_summarized_messages(self):
+        window = build_window(self.history, "earlier", 2)
+        self.assertEqual(window[0]["role"], "system")
+        self.assertIn("earlier", window[0]["content"])
+        self.assertEqual(window[1:], self.history[2:])
+
+    def test_build_window_keeps_evicted_messages_until_they_are_summarized(self):
+        budget = sum(message_tokens(m, CHAT_MODEL) for m in self.history[2:])
+        self.assertEqual(window_start(self.history, budget, CHAT_MODEL), 2)
+        self.assertEqual(build_window(self.history, "", 0), self.history)
+
+
+@mock.patch("learning.window.tiktoken", None)
+@override_settings(RAG_MIN_SCORE=0.3, RAG_CONTEXT_TOKEN_BUDGET=1000)
+class SelectContextTests(SimpleTestCase):
+
+    def test_drops_low_scores_and_near_duplicates(self):
+        context = select_context([
+            ("Абай Құнанбайұлы ақын", 0.9),
+            ("Абай Құнанбайұлы ақын.", 0.8),
+            ("Мұхтар Әуезов жазушы", 0.7),
+            ("Бөтен мәтін", 0.1),
+        ])
+        self.assertEqual(context, "Абай Құнанбайұлы ақын\n\nМұхтар Әуезов жазушы")
+
+    def test_skips_passages_already_in_the_window(self):
+        window = [message("assistant", "Абай Құнанбайұлы — ақын.")]
+        context = select_context([("Абай Құнанбайұлы ақын", 0.9), ("Мұхтар Әуезов жазушы", 0.7)], window)
+        self.assertEqual(context, "Мұхтар Әуезов жазушы")
+
+    def test_keeps_passages_the_window_does_not_show(self):
+        # Context from earlier turns is never persisted, so only the window counts as already seen
+        context = select_context([("Абай Құнанбайұлы ақын", 0.9)], [message("user", "Абай кім?")])
+        self.assertEqual(context, "Абай Құнанбайұлы ақын")
+
+    @override_settings(RAG_CONTEXT_TOKEN_BUDGET=0)
+    def test_respects_the_token_budget(self):
+        self.assertEqual(select_context([("Абай Құнанбайұлы ақын", 0.9)]), "")
+
+
+class DecodeTests(SimpleTestCase):
+
+    @mock.patch("learning.audio.AudioSegment.from_file")
+    def test_known_extensions_name_the_demuxer_and_others_are_probed(self, from_file):
+        decode(b"", "voice.M4A")
+        self.assertEqual(from_file.call_args.kwargs["format"], "mp4")
+        decode(b"", "voice.xyz")
+        self.assertIsNone(from_file.call_args.kwargs["format"])
+
+    @mock.patch("learning.audio.AudioSegment.from_file", side_effect=CouldntDecodeError("bad"))
+    def test_undecodable_upload_is_rejected(self, from_file):
+        with self.assertRaises(AudioUnreadable):
+            decode(b"", "voice.webm")
+
+
+class SplitAtSilenceTests(SimpleTestCase):
+
+    def tone(self, ms):
+        return Sine(440).to_audio_segment(duration=ms, volume=-6).set_channels(1)
+
+    def test_short_audio_is_a_single_chunk(self):
+        self.assertEqual(len(split_at_silence(self.tone(1000), 5000)), 1)
+
+    def test_cuts_at_the_last_pause_before_the_limit(self):
+        segment = self.tone(3000) + AudioSegment.silent(1000, frame_rate=44100) + self.tone(3000)
+        chunks = split_at_silence(segment, 5000)
+        self.assertEqual(len(chunks), 2)
+        # Cut in the middle of the pause, not at the 5 s limit
+        self.assertAlmostEqual(len(chunks[0]), 3500, delta=50)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(segment))
+
+    def test_cuts_at_the_limit_without_a_pause(self):
+        chunks = split_at_silence(self.tone(12000), 5000)
+        self.assertEqual([len(chunk) for chunk in chunks], [5000, 5000, 2000])
+
+
+class MergePayloadsTests(SimpleTestCase):
+
+    def test_joins_texts_in_order_and_drops_repeats(self):
+        merged = merge_payloads([{"text": "Сәлем."}, {"text": "Қалайсың?"}, {"text": "Сәлем."}])
+        self.assertEqual(merged, {"text": "Сәлем. Қалайсың?"})
+
+    def test_keeps_the_other_fields_of_the_last_payload(self):
+        merged = merge_payloads([{"text": "a", "wait": True}, {"text": "b", "wait": False}])
+        self.assertEqual(merged, {"text": "a b", "wait": False})
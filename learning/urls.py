@@ -1,12 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from .views import UserExperienceView, send_text, CreateChatView, GenerateReportView, ListUserReportsView, \
-    LearningProgramView, ReadingListView, ReadingDetailView, ReadingAnswerView, LessonDetailView, TaskAnswerView, upload_audio
+    ReportJobView, LearningProgramView, ReadingListView, ReadingDetailView, ReadingAnswerView, LessonDetailView, TaskAnswerView, upload_audio
 
 urlpatterns = [
     path('experience/', UserExperienceView.as_view(), name='user-experience'),
     path('chat/<int:chat_id>/', send_text, name='send-text'),
     path('chat/create/', CreateChatView.as_view(), name='create-chat'),
     path('chat/report/<int:chat_id>/', GenerateReportView.as_view(), name='generate-report'),
+    path('chat/report/job/<str:job_id>/', ReportJobView.as_view(), name='report-job'),
     path('chat/reports/', ListUserReportsView.as_view(), name='list-user-reports'),
     path('program/<int:level>/', LearningProgramView.as_view(), name='learning-program'),
     path('lesson/<int:id>/', LessonDetailView.as_view(), name='learning-lesson'),
@@ -16,3 +18,14 @@ urlpatterns = [
     path('reading/task/', ReadingAnswerView.as_view(), name='learning-reading-answer'),
     path('chat/audio/<int:chat_id>', upload_audio, name='upload-audio'),
 ]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    # Listed first so they take precedence over the synchronous views on the same paths
+    urlpatterns = [
+        path('chat/<int:chat_id>/', async_views.send_text, name='send-text'),
+        path('chat/report/<int:chat_id>/', async_views.generate_report, name='generate-report'),
+        path('reading/task/', async_views.reading_answer, name='learning-reading-answer'),
+        path('chat/audio/<int:chat_id>', async_views.upload_audio, name='upload-audio'),
+    ] + urlpatterns
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for the Pinecone vector store used by retrieve_context.
+
+    Every namespace is a directory under ``root`` containing ``texts.json`` (the
+    passages in row order) and either ``embeddings.npy`` (float32, one
+    L2-normalized row per passage) or, when quantized, ``embeddings_int8.npy``
+    with per-row ``scales.npy``. Matrices are memory-mapped, so only the pages
+    touched by a search are read from disk.
+    """
+
+    def __init__(self, root, embedding):
+        self.root = root
+        self.embedding = embedding
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def has_namespace(self, namespace):
+        return os.path.exists(os.path.join(self.root, namespace, "texts.json"))
+
+    def _load(self, namespace):
+        loaded = self._namespaces.get(namespace)
+        if loaded is not None:
+            return loaded
+        with self._lock:
+            if namespace not in self._namespaces:
+                path = os.path.join(self.root, namespace)
+                with open(os.path.join(path, "texts.json"), "r", encoding="utf-8") as file:
+                    texts = json.load(file)
+                if os.path.exists(os.path.join(path, "embeddings_int8.npy")):
+                    matrix = np.load(os.path.join(path, "embeddings_int8.npy"), mmap_mode="r")
+                    scales = np.load(os.path.join(path, "scales.npy"))
+                else:
+                    matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+                    scales = None
+                self._namespaces[namespace] = (matrix, scales, texts)
+            return self._namespaces[namespace]
+
+    def similarity_search_with_score(self, query, k=4, namespace=None):
+        matrix, scales, texts = self._load(namespace)
+        if not texts:
+            return []
+
+        vector = np.array(self.embedding.embed_query(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+
+        if scales is None:
+            scores = matrix @ vector
+        else:
+            scores = (matrix @ vector) * scales
+
+        k = min(k, len(texts))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(Document(page_content=texts[i]), float(scores[i])) for i in top]
+
+    def similarity_search(self, query, k=4, namespace=None):
+        return [document for document, _ in self.similarity_search_with_score(query, k=k, namespace=namespace)]
+
+    @staticmethod
+    def build(root, namespace, texts, vectors, quantize=False):
+        """Write a namespace in the on-disk layout read by ``LocalVectorIndex``."""
+        path = os.path.join(root, namespace)
+        os.makedirs(path, exist_ok=True)
+
+        matrix = np.array(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+
+        for name in ("embeddings.npy", "embeddings_int8.npy", "scales.npy"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+        if quantize:
+            # Symmetric per-row quantization: row ~= int8_row * scale
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+            quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(path, "embeddings_int8.npy"), quantized)
+            np.save(os.path.join(path, "scales.npy"), scales)
+        else:
+            np.save(os.path.join(path, "embeddings.npy"), matrix)
+
+        with open(os.path.join(path, "texts.json"), "w", encoding="utf-8") as file:
+            json.dump(list(texts), file, ensure_ascii=False)
@@ -1,9 +1,10 @@
-import os
+import json
 
 import requests
+from celery.result import AsyncResult
 from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils.timezone import now
 from drf_yasg import openapi
 from drf_yasg.openapi import Schema, TYPE_OBJECT, TYPE_INTEGER, TYPE_BOOLEAN, TYPE_STRING
@@ -15,11 +16,14 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from core.settings import MEDIA_ROOT
+from .audio import AudioRejected, AudioUnreadable, read_upload
 from .models import Experience, ReadingQuestion, Chat, GPTReport, Lessons, TaskAnswer, Tasks, Reading, ReadingAnswer
-from .open import User, query_api, analyze_dialogue, check_reading_answers
+from .open import User, query_api, query_api_stream, analyze_dialogue, check_reading_answers
 from .serializers import ExperienceSerializer, GPTReportSerializer, LessonsSerializer, TasksSerializer, \
     ReadingSerializer, ReadingQuestionSerializer
-from .tasks import post_text_to_service
+from .tasks import post_text_to_service, queue_report, report_job_owner, save_report
+
+SYNTHESIZE_URL = "https://7a68-178-91-253-72.ngrok-free.app/synthesize/"
 
 
 class UserExperienceView(APIView):
@@ -39,10 +43,31 @@ class UserExperienceView(APIView):
 
 
 
+def stream_chat_response(user, prompt_kk):
+    """Server-sent events: one "sentence" event per translated sentence, then a final "done" event."""
+    sentences = []
+    try:
+        for sentence in query_api_stream(user, prompt_kk):
+            sentences.append(sentence)
+            yield f"event: sentence\ndata: {json.dumps({'sentence': sentence}, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        return
+
+    response_text = " ".join(sentences)
+    post_text_to_service.delay(SYNTHESIZE_URL, {"text": response_text})
+    yield f"event: done\ndata: {json.dumps({'response': response_text}, ensure_ascii=False)}\n\n"
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @swagger_auto_schema(
-    operation_description="Submit text to the chat API",
+    operation_description="Submit text to the chat API. "
+                          "With ?stream=true the answer is sent as server-sent events, one per sentence.",
+    manual_parameters=[
+        openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                          description='Stream the answer sentence by sentence as text/event-stream'),
+    ],
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
@@ -65,11 +90,17 @@ def send_text(request, chat_id):
         user = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
         prompt_kk = request.data.get('prompt_kk')
         print(prompt_kk)
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            response = StreamingHttpResponse(stream_chat_response(user, prompt_kk), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
         response_text = query_api(user, prompt_kk)
 
-        url = "https://7a68-178-91-253-72.ngrok-free.app/synthesize/"
         data = {"text": response_text}
-        post_text_to_service.delay(url, data)
+        post_text_to_service.delay(SYNTHESIZE_URL, data)
         return JsonResponse({'response': response_text})
 
     except Chat.DoesNotExist:
@@ -110,19 +141,43 @@ class GenerateReportView(APIView):
         user = request.user
         chat = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
         result = analyze_dialogue(chat)
-        new_report = GPTReport(user=user, report_data=result)
-        new_report.save()
+        save_report(user, result)
+        return JsonResponse({"report": result})
+
+    @swagger_auto_schema(
+        operation_description="Start generating a report in the background. "
+                              "Poll chat/report/job/<job_id>/ for the result.",
+        responses={202: Schema(
+            type=TYPE_OBJECT,
+            properties={
+                'job_id': Schema(type=TYPE_STRING, description='The ID of the report job')
+            }
+        )}
+    )
+    def post(self, request, chat_id):
+        job_id = queue_report(request.user.id, chat_id)
+        return Response({'job_id': job_id}, status=status.HTTP_202_ACCEPTED)
 
-        vocabulary_score = result.get('vocabulary', {}).get('score', 0)
-        communication_score = result.get('communication_effectiveness', {}).get('score', 0)
-        contextual_score = result.get('contextual_understanding', {}).get('score', 0)
 
-        experience, created = Experience.objects.get_or_create(user=user)
-        experience.vocabulary_exp += vocabulary_score * 10
-        experience.speaking_exp += communication_score * 10
-        experience.grammar_exp += contextual_score * 10
-        experience.save()
-        return JsonResponse({"report": result})
+class ReportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Get the status of a report job, and the report once it is ready"
+    )
+    def get(self, request, job_id):
+        if report_job_owner(job_id) != request.user.id:
+            return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        job = AsyncResult(job_id)
+        if job.state == 'FAILURE':
+            return Response({'status': 'failure', 'error': str(job.result)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if job.state != 'SUCCESS':
+            return Response({'status': job.state.lower()}, status=status.HTTP_202_ACCEPTED)
+
+        report = GPTReport.objects.get(id=job.result['report_id'])
+        return Response({'status': 'success', 'report': GPTReportSerializer(report).data})
 
 
 class ListUserReportsView(APIView):
@@ -214,40 +269,49 @@ class ReadingDetailView(APIView):
             return Response({'message': 'Reading not found'}, status=404)
 
 
-class ReadingAnswerView(APIView):
-    permission_classes = [IsAuthenticated]
+def get_reading_inputs(answers):
+    """Split submitted answers into (answers_kk, question_ids, questions_en, reading_text)."""
+    answers_kk = [answer_data.get('answer') for answer_data in answers]
+    question_ids = [answer_data.get('id') for answer_data in answers]
 
-    def post(self, request):
-        answers_kk = [answer_data.get('answer') for answer_data in request.data.get('answers', [])]
-        question_ids = [answer_data.get('id') for answer_data in request.data.get('answers', [])]
+    reading_questions = ReadingQuestion.objects.filter(id__in=question_ids).select_related('reading')
+
+    questions_en = {rq.id: rq.question_en for rq in reading_questions}
+    readings_texts = {rq.id: rq.reading.text_en for rq in reading_questions}
+
+    questions_en_list = [questions_en.get(id) for id in question_ids]
+    readings_texts_list = [readings_texts.get(id) for id in question_ids]
+    return answers_kk, question_ids, questions_en_list, readings_texts_list[0]
 
-        reading_questions = ReadingQuestion.objects.filter(id__in=question_ids).select_related('reading')
 
-        questions_en = {rq.id: rq.question_en for rq in reading_questions}
-        readings_texts = {rq.id: rq.reading.text_en for rq in reading_questions}
+def save_reading_answers(user, question_ids, answers_kk, api_result):
+    with transaction.atomic():
+        experience, created = Experience.objects.get_or_create(user=user)
+        for i, question_id in enumerate(question_ids):
+            score = api_result['scores'][i]
+            ReadingAnswer.objects.create(
+                user=user,
+                reading_question_id=question_id,
+                answer=answers_kk[i],
+                correct=api_result['scores'][i]
+            )
 
-        questions_en_list = [questions_en.get(id) for id in question_ids]
-        readings_texts_list = [readings_texts.get(id) for id in question_ids]
+            if score == 1:
+                experience.reading_exp += 500
+                experience.writing_exp += 300
+                experience.vocabulary_exp += 100
 
-        api_result = check_reading_answers(answers_kk, questions_en_list, readings_texts_list[0])
+
+class ReadingAnswerView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        answers_kk, question_ids, questions_en_list, text = get_reading_inputs(request.data.get('answers', []))
+
+        api_result = check_reading_answers(answers_kk, questions_en_list, text)
 
         try:
-            with transaction.atomic():
-                experience, created = Experience.objects.get_or_create(user=request.user)
-                for i, answer_data in enumerate(request.data.get('answers', [])):
-                    question_id = answer_data.get('id')
-                    score = api_result['scores'][i]
-                    ReadingAnswer.objects.create(
-                        user=request.user,
-                        reading_question_id=question_id,
-                        answer=answers_kk[i],
-                        correct=api_result['scores'][i]
-                    )
-
-                    if score == 1:
-                        experience.reading_exp += 500
-                        experience.writing_exp += 300
-                        experience.vocabulary_exp += 100
+            save_reading_answers(request.user, question_ids, answers_kk, api_result)
         except Exception as e:
             return Response({'error': 'Failed to save reading answers. ' + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -261,26 +325,21 @@ def upload_audio(request, chat_id):
     if not audio_file:
         return JsonResponse({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    upload_dir = os.path.join(settings.BASE_DIR, 'media')
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, audio_file.name)
-    print("Attempting to save to:", file_path)
-
-    with open(file_path, 'wb+') as destination:
-        for chunk in audio_file.chunks():
-            destination.write(chunk)
-
     try:
+        audio = read_upload(audio_file, settings.AUDIO_MAX_UPLOAD_BYTES)
         chat = Chat.objects.get(id=chat_id)
         user = User(id=chat_id, name="Эламир", surname="Кадыргалеев", age=20)
-        response_text = query_api(user, path_to_audio=file_path)
+        response_text = query_api(user, audio=audio, audio_name=audio_file.name)
         print(response_text)
 
-        url = "https://7a68-178-91-253-72.ngrok-free.app/synthesize/"
         data = {"text": response_text}
-        post_text_to_service.delay(url, data)
+        post_text_to_service.delay(SYNTHESIZE_URL, data)
 
         return JsonResponse({'response': response_text})
+    except AudioRejected as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except AudioUnreadable as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Chat.DoesNotExist:
         return JsonResponse({'error': 'Chat not found'}, status=status.HTTP_404_NOT_FOUND)
     except User.DoesNotExist:
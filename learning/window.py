@@ -0,0 +1,61 @@
+import functools
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # listed in requirements.txt; the estimate only keeps a broken install serving
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+if tiktoken is None:
+    logger.warning("tiktoken is not installed: chat history budgets use a rough len(text) / 4 token estimate")
+
+# Tokens the chat format adds around every message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model):
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    return len(_encoding(model).encode(text))
+
+
+def message_tokens(message, model):
+    return count_tokens(message["content"], model) + MESSAGE_OVERHEAD
+
+
+def window_start(history, budget, model):
+    """Index of the oldest message of the most recent turns that fit in ``budget`` tokens."""
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        used += message_tokens(history[i], model)
+        if used > budget:
+            break
+        start = i
+    # Start on a student message so the window never opens with a dangling answer
+    while start < len(history) and history[start]["role"] != "user":
+        start += 1
+    return start
+
+
+def build_window(history, summary, summary_upto):
+    """
+    Messages to send for the dialogue part of the prompt: the rolling summary of
+    older turns (if any) followed by every message it does not cover yet. Turns
+    that no longer fit the token budget (see ``window_start``) stay here until
+    the summary has folded them in, so none is ever dropped from both.
+    """
+    window = []
+    if summary:
+        window.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    return window + history[summary_upto:]
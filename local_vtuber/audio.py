@@ -2,49 +2,221 @@ import asyncio
 import json
 import queue
 import concurrent.futures
-import os
+import dataclasses
+import re
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
-import requests
-import websockets.exceptions
+import aiohttp
 
 from vtube_plugin.connector import VTubeConnector
 
+TTS_BASE_URL = "https://bff.listnr.tech/api/tts/v1/"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str, min_length: int = 20) -> list:
+    """Split a reply into sentences, gluing very short ones to the next so each TTS request is worth its round trip."""
+    sentences = []
+    pending = ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= min_length:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+class MemoryBudget:
+    """Bounds the bytes of synthesized audio held in memory while waiting to be played."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int):
+        async with self._condition:
+            # A clip larger than the whole budget still gets through once everything before it has played
+            await self._condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+
+@dataclasses.dataclass
+class Utterance:
+    """One /synthesize/ request; ``done`` resolves once its last sentence has been heard."""
+    text: str
+    sentences: int = 0
+    failed_sentences: int = 0
+    status: str = "queued"
+    id: str = dataclasses.field(default_factory=lambda: uuid.uuid4().hex)
+    done: asyncio.Future = dataclasses.field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+    def finish(self, status=None):
+        if status is None:
+            status = "failed" if self.sentences and self.failed_sentences == self.sentences else "done"
+        if not self.done.done():
+            self.status = status
+            self.done.set_result(status)
+
+    def finish_after(self, played):
+        """Finish when ``played`` (the last clip handed to the output engine) has been heard."""
+        if played is None or played.done():
+            self.finish()
+        else:
+            played.add_done_callback(lambda _: self.finish())
+
 
 class AsyncSpeechSynthesizer:
-    def __init__(self, connector: VTubeConnector = None):
+    def __init__(self, connector: VTubeConnector = None, max_concurrent_synthesis: int = 3,
+                 request_timeout: float = 30, max_retries: int = 3, max_buffered_bytes: int = 32 * 1024 * 1024):
         self.api = ""
+        self.session = None
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
         self.is_playing = False
-        self.playback_queue = asyncio.Queue()  # Changed to asyncio.Queue
+        # Holds one (utterance, synthesis task, is last sentence) entry per sentence, in speaking order
+        self.playback_queue = asyncio.Queue()
+        # Recent utterances by id, for the status endpoint
+        self.utterances = OrderedDict()
+        self.max_utterances = 256
         self.audio_generation_lock = asyncio.Lock()
+        self.synthesis_semaphore = asyncio.Semaphore(max_concurrent_synthesis)
+        self.memory_budget = MemoryBudget(max_buffered_bytes)
+        # Completes once the most recently queued sentence has its share of the memory budget
+        self.last_reservation = None
         self.connector = connector
         print(self.connector, self.connector.audio_processor)
 
-    async def enqueue_text(self, text: str):
+    async def enqueue_text(self, text: str) -> Utterance:
+        utterance = Utterance(text)
+        self.utterances[utterance.id] = utterance
+        while len(self.utterances) > self.max_utterances:
+            self.utterances.popitem(last=False)
+
+        sentences = split_sentences(text)
+        utterance.sentences = len(sentences)
+        if not sentences:
+            utterance.finish()
+            return utterance
+
+        # The lock only covers queueing, so sentences of concurrent replies never interleave
         async with self.audio_generation_lock:
-            unique_filename = f"{uuid.uuid4().hex}.wav"
-            await self.speech_synthesis_to_wav_file(text, unique_filename)
-            await self.playback_queue.put(unique_filename)  # Changed to async put
+            for i, sentence in enumerate(sentences):
+                previous, self.last_reservation = self.last_reservation, asyncio.get_running_loop().create_future()
+                task = asyncio.create_task(self.synthesize_sentence(sentence, previous, self.last_reservation))
+                await self.playback_queue.put((utterance, task, i == len(sentences) - 1))
         if not self.is_playing:
+            self.is_playing = True
             asyncio.create_task(self.play_audio_from_queue())
+        return utterance
+
+    async def synthesize_sentence(self, sentence: str, previous: asyncio.Future, reservation: asyncio.Future):
+        """
+        Synthesize one sentence and return its WAV bytes, or None if the backend returned no audio.
+        Clips reserve memory in speaking order, so later sentences can never use up the budget
+        the next clip to be played is waiting for.
+        """
+        audio_data = None
+        try:
+            async with self.synthesis_semaphore:
+                audio_data = await self.synthesize_speech(sentence)
+            if previous is not None:
+                await previous
+            if audio_data:
+                await self.memory_budget.acquire(len(audio_data))
+        finally:
+            reservation.set_result(None)
+        return audio_data
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """One keep-alive connection pool to the TTS host, created inside the running event loop."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout, connect=5),
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, url: str, **kwargs) -> bytes:
+        """Perform a request with exponential backoff on connection errors, timeouts and 429/5xx responses."""
+        session = await self.get_session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                        response.raise_for_status()
+                        return await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
 
     async def play_audio_from_queue(self):
         try:
             self.is_playing = True
+            played = None
             while not self.playback_queue.empty():
-                file_path = await self.playback_queue.get()  # Changed to async get
-                await self.connector.audio_processor.play_and_send_data(file_path)
-                self.playback_queue.task_done()
-                os.remove(file_path)
-        except websockets.exceptions.ConnectionClosedError as e:
-            print(f"Connection closed: {e}")
-            await self.connector.reauthenticate()
+                # Clips are handed to the output engine as soon as they are ready, so they play
+                # back to back; then wait for the last one before deciding we are done.
+                while not self.playback_queue.empty():
+                    utterance, task, is_last = await self.playback_queue.get()
+                    audio_data = None
+                    try:
+                        audio_data = await task
+                    except Exception as e:
+                        print(f"Speech synthesis failed: {e}")
+                        utterance.failed_sentences += 1
+                    try:
+                        if audio_data:
+                            utterance.status = "playing"
+                            played = await self.connector.audio_processor.play_and_send_data(audio_data)
+                    except Exception as e:
+                        # One bad clip must not stop the player: everything queued behind it still has to resolve
+                        print(f"Playback failed: {e}")
+                        utterance.failed_sentences += 1
+                    finally:
+                        self.playback_queue.task_done()
+                        if audio_data:
+                            await self.memory_budget.release(len(audio_data))
+                        if is_last:
+                            utterance.finish_after(played)
+                if played is not None:
+                    await played
         finally:
             self.is_playing = False
 
-    async def speech_synthesis_to_wav_file(self, text: str, file_name: str, gender: str = "female", audio_format: str = "wav") -> None:
-        """Performs speech synthesis to a WAV file with adjustable pitch."""
+    async def stop(self):
+        """Drop every queued sentence and cut the one being played."""
+        while not self.playback_queue.empty():
+            utterance, task, is_last = self.playback_queue.get_nowait()
+            task.cancel()
+            if task.done() and not task.cancelled() and task.exception() is None and task.result():
+                await self.memory_budget.release(len(task.result()))
+            self.playback_queue.task_done()
+            utterance.finish("stopped")
+        self.connector.audio_processor.stop()
+
+    async def synthesize_speech(self, text: str, gender: str = "female", audio_format: str = "wav"):
+        """Performs speech synthesis and returns the audio file contents, kept in memory."""
 
         if gender == "male":
             voice = "kk-KZ-DauletNeural"
@@ -58,8 +230,7 @@ class AsyncSpeechSynthesizer:
             "Content-Type": "application/json"
         }
 
-        base_url = "https://bff.listnr.tech/api/tts/v1/"
-        endpoint = base_url + "convert-text"
+        endpoint = TTS_BASE_URL + "convert-text"
 
         body = json.dumps({
             "voice": voice,
@@ -67,13 +238,9 @@ class AsyncSpeechSynthesizer:
             "audioFormat": audio_format
         })
 
-        response = requests.post(endpoint, headers=headers, data=body)
-        response_data = response.json()
+        response_data = json.loads(await self.request("POST", endpoint, headers=headers, data=body))
         print(response_data)
 
         if 'url' in response_data:
-            audio_url = response_data['url']
-            audio_response = requests.get(audio_url)
-
-            with open(file_name, "wb") as audio_file:
-                audio_file.write(audio_response.content)
+            return await self.request("GET", response_data['url'])
+        return None
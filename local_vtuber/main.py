@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response, status
 from pydantic import BaseModel
 import asyncio
 
@@ -10,6 +10,8 @@ app = FastAPI()
 
 class TextRequest(BaseModel):
     text: str
+    # False: answer 202 with an utterance id right away instead of waiting for playback
+    wait: bool = True
 
 
 connector = None
@@ -24,17 +26,52 @@ async def startup_event():
     audio_generator = AsyncSpeechSynthesizer(connector)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if audio_generator is not None:
+        await audio_generator.close()
+    if connector is not None:
+        await connector.parameter_scheduler.stop()
+        # Releases the PortAudio stream opened for the lifetime of the app
+        connector.audio_processor.engine.close()
+
+
 @app.post("/synthesize/")
-async def synthesize_text(request: TextRequest):
+async def synthesize_text(request: TextRequest, response: Response):
     print(f"Received request to synthesize text: {request.text}")
-    global audio_generator
+    utterance = await audio_generator.enqueue_text(request.text)
+
+    if not request.wait:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"utterance_id": utterance.id, "status": utterance.status}
+
+    # Shielded so a client disconnect does not cancel the utterance's own future
+    await asyncio.shield(utterance.done)
+    return {"message": "Synthesis complete for text", "text": request.text,
+            "utterance_id": utterance.id, "status": utterance.status}
+
+
+@app.post("/synthesize/stop")
+async def stop_synthesis():
+    """Drop every queued sentence and cut the clip being played within one buffer period."""
+    await audio_generator.stop()
+    return {"message": "Playback stopped"}
 
-    await audio_generator.enqueue_text(request.text)
 
-    await audio_generator.audio_generation_lock.acquire()
-    audio_generator.audio_generation_lock.release()
+@app.get("/synthesize/{utterance_id}")
+async def synthesis_status(utterance_id: str):
+    utterance = audio_generator.utterances.get(utterance_id)
+    if utterance is None:
+        raise HTTPException(status_code=404, detail="Utterance not found")
+    return {
+        "utterance_id": utterance.id,
+        "status": utterance.status,
+        "sentences": utterance.sentences,
+        "failed_sentences": utterance.failed_sentences,
+    }
 
-    while audio_generator.is_playing or not audio_generator.playback_queue.empty():
-        await asyncio.sleep(0.1)
 
-    return {"message": "Synthesis complete for text", "text": request.text}
+@app.get("/parameters/stats")
+async def parameter_stats():
+    """Achieved frame rate and drop counters of the parameter frame scheduler."""
+    return connector.parameter_scheduler.stats()
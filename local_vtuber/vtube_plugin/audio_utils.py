@@ -1,32 +1,82 @@
 import asyncio
+import dataclasses
+import io
 import wave
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-import audioop
-import pyaudio
+
+import numpy as np
+
+from .constants import LIP_SYNC_FPS
+from .output import AudioOutputEngine
+
+
+def pcm_samples(frames, sample_width):
+    """Interleaved PCM ``frames`` as float32 samples in 16-bit units."""
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        # Place the 24-bit sample in the top bytes of an int32 to keep its sign
+        samples = (raw[:, 0] << 8 | raw[:, 1] << 16 | raw[:, 2] << 24).astype(np.float32) / 65536
+    else:
+        dtype = np.int16 if sample_width == 2 else np.int32
+        samples = np.frombuffer(frames, dtype=dtype).astype(np.float32) / (1 << (8 * sample_width - 16))
+    return samples
+
+
+def rms_envelope(frames, sample_width, channels, frame_rate, fps):
+    """RMS of every 1/fps window of interleaved PCM ``frames``, in 16-bit sample units."""
+    samples = pcm_samples(frames, sample_width)
+    window = max(1, frame_rate // fps) * channels
+    count = -(-len(samples) // window)
+    samples = np.pad(samples, (0, count * window - len(samples)))
+    return np.sqrt(np.mean(samples.reshape(count, window) ** 2, axis=1))
+
+
+def to_stream_format(audio_data, rate, channels):
+    """Decode a WAV clip to int16 frames of shape ``(frames, channels)`` at ``rate``."""
+    with wave.open(io.BytesIO(audio_data), 'rb') as wf:
+        params = wf.getparams()
+        frames = wf.readframes(wf.getnframes())
+    samples = pcm_samples(frames, params.sampwidth).reshape(-1, params.nchannels)
+
+    if params.nchannels != channels:
+        samples = np.repeat(samples.mean(axis=1, keepdims=True), channels, axis=1)
+    if params.framerate != rate and len(samples):
+        # Linear interpolation is plenty for speech
+        positions = np.arange(int(round(len(samples) * rate / params.framerate))) * (params.framerate / rate)
+        source = np.arange(len(samples))
+        samples = np.column_stack([np.interp(positions, source, samples[:, c]) for c in range(channels)])
+    return np.clip(np.round(samples), -32768, 32767).astype(np.int16)
+
+
+@dataclasses.dataclass
+class ScheduledClip:
+    start: int
+    end: int
+    envelope: np.ndarray
+    played: asyncio.Future
 
 
 class AudioProcessor:
-    def __init__(self, communicator):
+    def __init__(self, communicator, scheduler, engine=None, envelope_fps=LIP_SYNC_FPS):
         print("Initializing AudioProcessor")
         self.communicator = communicator
+        self.scheduler = scheduler
+        self.engine = engine or AudioOutputEngine()
+        # Only runs engine.write, so clips are queued in the order they were submitted
         self.executor = ThreadPoolExecutor(max_workers=1)
-        self.current_rms = 0
-
-    async def update_parameter(self, parameter_id, value, weight=None, mode="set", face_found=False):
-        if not (-1000000 <= value <= 1000000):
-            raise ValueError("Value must be a floating-point number between -1000000 and 1000000.")
+        self.envelope_fps = envelope_fps
+        self.timeline = deque()
+        self.lip_sync_task = None
 
-        parameter_values = [{"id": parameter_id, "value": value}]
+    def start(self):
+        self.engine.start()
 
-        msg = self.communicator.get_msg_template()
-        msg["messageType"] = "InjectParameterDataRequest"
-        msg["data"] = {
-            "faceFound": face_found,
-            "mode": mode,
-            "parameterValues": parameter_values
-        }
-        # print(f"Sending parameter update: {msg}")
-        result = await self.communicator.send(msg)
+    async def update_parameter(self, parameter_id, value, weight=None):
+        # Sent with the next frame of the scheduler; a newer value replaces an unsent one
+        self.scheduler.set(parameter_id, value, weight)
 
     async def translate_audio_to_mouth_movement(self, rms):
         max_rms = 32768
@@ -34,36 +84,60 @@ class AudioProcessor:
         scaled_value = int(scaled_value * 1.7)
         await self.update_parameter("CustomSoundTracker", scaled_value)
 
-    def play_audio(self, audio_file_path):
-        wf = wave.open(audio_file_path, 'rb')
+    async def play_and_send_data(self, audio_data):
+        """
+        Queue a WAV clip on the output engine and return a future that completes once it has been heard.
+        Returns as soon as the whole clip is in the ring buffer, so the next clip can be queued behind it.
+        """
+        samples = to_stream_format(audio_data, self.engine.rate, self.engine.channels)
+        envelope = rms_envelope(samples.tobytes(), 2, self.engine.channels, self.engine.rate, self.envelope_fps)
 
-        p = pyaudio.PyAudio()
-        stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                        channels=wf.getnchannels(),
-                        rate=wf.getframerate(),
-                        output=True,
-                        frames_per_buffer=1024)
+        loop = asyncio.get_running_loop()
+        played = loop.create_future()
+        clip = ScheduledClip(0, len(samples), envelope, played)
 
-        chunk_size = 1024
-        data = wf.readframes(chunk_size)
-        while data:
-            stream.write(data)
+        def on_start(start):
+            clip.start, clip.end = start, start + len(samples)
+            loop.call_soon_threadsafe(self.schedule, clip)
 
-            self.current_rms = audioop.rms(data, wf.getsampwidth())
+        start = await loop.run_in_executor(self.executor, self.engine.write, samples, on_start)
+        if start is None and not played.done():
+            played.set_result(None)
+        return played
 
-            data = wf.readframes(chunk_size)
+    def schedule(self, clip):
+        if clip.played.done():
+            return
+        self.timeline.append(clip)
+        if self.lip_sync_task is None or self.lip_sync_task.done():
+            self.lip_sync_task = asyncio.create_task(self.lip_sync())
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        self.current_rms = 0
-
-    async def play_and_send_data(self, audio_file_path):
-        future = self.executor.submit(self.play_audio, audio_file_path)
+    async def lip_sync(self):
+        """Drive the mouth from the envelope of the clip being heard, following the engine's playback clock."""
         try:
-            while not future.done():
-                await self.translate_audio_to_mouth_movement(int(self.current_rms))
-                await asyncio.sleep(0.02)
+            while self.timeline:
+                position = self.engine.position()
+                while self.timeline and self.timeline[0].end <= position:
+                    clip = self.timeline.popleft()
+                    if not clip.played.done():
+                        clip.played.set_result(None)
+
+                rms = 0
+                if self.timeline and self.timeline[0].start <= position:
+                    clip = self.timeline[0]
+                    index = int((position - clip.start) / self.engine.rate * self.envelope_fps)
+                    rms = clip.envelope[index] if index < len(clip.envelope) else 0
+                await self.translate_audio_to_mouth_movement(int(rms))
+                await asyncio.sleep(1 / self.envelope_fps)
+            await self.translate_audio_to_mouth_movement(0)
         except Exception as e:
             print(f"Error during playback and parameter update: {str(e)}")
             raise e
+
+    def stop(self):
+        """Cut playback within one buffer period and release everyone waiting on a queued clip."""
+        self.engine.flush()
+        while self.timeline:
+            clip = self.timeline.popleft()
+            if not clip.played.done():
+                clip.played.set_result(None)
@@ -47,7 +47,8 @@ class AuthManager:
                 "pluginName": self.plugin_name,
                 "pluginDeveloper": self.plugin_developer
             }
-            auth_response = await self.communicator.send(auth_msg)
+            # VTube Studio answers only after the user clicks "Allow" in its popup
+            auth_response = await self.communicator.send(auth_msg, timeout=None)
 
             auth_response = json.loads(auth_response)
             self.auth_token = auth_response["data"]["authenticationToken"]
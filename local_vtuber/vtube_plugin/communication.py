@@ -1,7 +1,12 @@
 import asyncio
 import json
+import uuid
+
 import websockets
 
+# Default for ``CommunicationManager.send``: wait ``response_timeout`` seconds
+RESPONSE_TIMEOUT = object()
+
 
 class CommunicationManager:
     def __init__(self, uri, plugin_name="Assistant", plugin_developer='AlekGreen'):
@@ -11,6 +16,11 @@ class CommunicationManager:
         self.auth_token = None
         self.websocket = None
         self.reconnect_delay = 1
+        self.response_timeout = 10
+        # requestID -> future resolved with the raw response by the reader task
+        self.pending = {}
+        self.reader_task = None
+        self.connect_lock = asyncio.Lock()
 
     def set_auth_token(self, auth_token):
         self.auth_token = auth_token
@@ -19,7 +29,7 @@ class CommunicationManager:
         return {
             "apiName": "VTubeStudioPublicAPI",
             "apiVersion": "1.0",
-            "requestID": f"AssistantID",
+            "requestID": uuid.uuid4().hex,
         }
 
     async def authenticate_session(self):
@@ -37,6 +47,7 @@ class CommunicationManager:
         try:
             if not self.websocket or self.websocket.closed:
                 self.websocket = await websockets.connect(self.uri, ping_interval=3)
+                self.reader_task = asyncio.create_task(self.read_responses(self.websocket))
                 await self.authenticate_session()
                 self.reconnect_delay = 1
                 asyncio.create_task(self.ping_pong_handler())
@@ -58,14 +69,58 @@ class CommunicationManager:
                 await self.handle_reconnect()
             await asyncio.sleep(10)
 
+    async def read_responses(self, websocket):
+        """Single reader of the socket: hands every response to the request that is waiting for it."""
+        try:
+            async for message in websocket:
+                try:
+                    request_id = json.loads(message).get("requestID")
+                except json.JSONDecodeError:
+                    continue
+                future = self.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            # A reader left over from a previous connection must not fail the new one's requests
+            if self.websocket is None or self.websocket is websocket:
+                self.fail_pending(websockets.ConnectionClosed(None, None))
+
+    def fail_pending(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self.pending.clear()
+
     async def ensure_open(self):
-        if self.websocket is None or self.websocket.closed:
-            await self.connect()
+        if self.websocket is not None and not self.websocket.closed:
+            return
+        async with self.connect_lock:
+            if self.websocket is None or self.websocket.closed:
+                await self.connect()
+
+    async def send(self, msg, timeout=RESPONSE_TIMEOUT):
+        """
+        Send a request and wait for the response carrying the same requestID.
+        ``timeout`` defaults to ``response_timeout``; None waits as long as it takes.
+        """
+        if timeout is RESPONSE_TIMEOUT:
+            timeout = self.response_timeout
+        await self.ensure_open()
+        request_id = msg.setdefault("requestID", uuid.uuid4().hex)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await self.websocket.send(json.dumps(msg))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
 
-    async def send(self, msg):
+    async def send_nowait(self, msg):
+        """Send a request without waiting for its response, which the reader then discards."""
         await self.ensure_open()
         await self.websocket.send(json.dumps(msg))
-        return await self.websocket.recv()
 
     async def handle_reconnect(self):
         await self.close()
@@ -75,6 +130,9 @@ class CommunicationManager:
         await self.connect()
 
     async def close(self):
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.reader_task = None
         if self.websocket is not None:
             await self.websocket.close()
             self.websocket = None
@@ -3,6 +3,7 @@ from .communication import CommunicationManager
 from .parameters import ParameterManager
 from .audio_utils import AudioProcessor
 from .constants import DEFAULT_EXPRESSIONS
+from .frames import ParameterFrameScheduler
 
 
 class VTubeConnector:
@@ -15,13 +16,16 @@ class VTubeConnector:
         self.communicator = CommunicationManager(self.uri, self.plugin_name, self.plugin_developer)
         self.auth_manager = AuthManager(self.plugin_name, self.plugin_developer, self.communicator)
         self.parameter_manager = ParameterManager(self.communicator)
-        self.audio_processor = AudioProcessor(self.communicator)
+        self.parameter_scheduler = ParameterFrameScheduler(self.communicator)
+        self.audio_processor = AudioProcessor(self.communicator, self.parameter_scheduler)
         print(self.audio_processor)
 
     async def start(self):
         await self.communicator.connect()
         await self.auth_manager.init_connection()
         await self.parameter_manager.setup_custom_parameter()
+        self.parameter_scheduler.start()
+        self.audio_processor.start()
 
     async def reauthenticate(self):
         await self.communicator.connect()
@@ -8,4 +8,15 @@ DEFAULT_EXPRESSIONS = {
     "sad": "My Animation 3",
     "surprised": "My Animation 5",
     "embarrassment": "My Animation 6"
-}
\ No newline at end of file
+}
+# Frames per second of the precomputed loudness envelope that drives lip-sync
+LIP_SYNC_FPS = 50
+
+# Rate at which pending parameter values are sent to VTube Studio
+PARAMETER_FPS = 30
+
+# Format of the persistent output stream; clips are resampled to it
+OUTPUT_SAMPLE_RATE = 24000
+OUTPUT_CHANNELS = 1
+OUTPUT_FRAMES_PER_BUFFER = 1024
+OUTPUT_BUFFER_SECONDS = 2.0
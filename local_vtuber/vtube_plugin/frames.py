@@ -0,0 +1,93 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+
+import websockets
+
+from .constants import PARAMETER_FPS
+
+
+class ParameterFrameScheduler:
+    """
+    Sends injected parameter values to VTube Studio as frames at a fixed rate.
+
+    ``set`` only records the latest value of a parameter; once per frame every
+    pending value is sent in a single InjectParameterDataRequest. A value
+    replaced before its frame went out is dropped rather than queued, so a slow
+    socket never makes the model play stale values.
+    """
+
+    def __init__(self, communicator, fps=PARAMETER_FPS, mode="set", face_found=False):
+        self.communicator = communicator
+        self.fps = fps
+        self.latest = {}
+        self.task = None
+        self.message = communicator.get_msg_template()
+        self.message["messageType"] = "InjectParameterDataRequest"
+        self.message["data"] = {"faceFound": face_found, "mode": mode, "parameterValues": []}
+        self.frames_sent = 0
+        self.dropped_frames = 0
+        self.superseded_values = 0
+        self.send_times = deque(maxlen=2 * fps)
+
+    def set(self, parameter_id, value, weight=None):
+        if not (-1000000 <= value <= 1000000):
+            raise ValueError("Value must be a floating-point number between -1000000 and 1000000.")
+        parameter = {"id": parameter_id, "value": value}
+        if weight is not None:
+            parameter["weight"] = weight
+        if parameter_id in self.latest:
+            self.superseded_values += 1
+        self.latest[parameter_id] = parameter
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        period = 1 / self.fps
+        next_frame = time.monotonic()
+        while True:
+            next_frame += period
+            await asyncio.sleep(max(0.0, next_frame - time.monotonic()))
+
+            now = time.monotonic()
+            if now - next_frame >= period:
+                # Fell behind: skip the frames we missed instead of bursting them out
+                missed = int((now - next_frame) / period)
+                self.dropped_frames += missed
+                next_frame += missed * period
+
+            if self.latest:
+                await self.send_frame()
+
+    async def send_frame(self):
+        frame, self.latest = self.latest, {}
+        self.message["requestID"] = uuid.uuid4().hex
+        self.message["data"]["parameterValues"] = list(frame.values())
+        try:
+            await self.communicator.send_nowait(self.message)
+        except (websockets.ConnectionClosed, OSError) as e:
+            print(f"Failed to send parameter frame: {e}")
+            # Keep the values for the next frame unless newer ones arrived meanwhile
+            for parameter_id, parameter in frame.items():
+                self.latest.setdefault(parameter_id, parameter)
+            return
+        self.frames_sent += 1
+        self.send_times.append(time.monotonic())
+
+    def stats(self):
+        window = self.send_times[-1] - self.send_times[0] if len(self.send_times) > 1 else 0
+        return {
+            "target_fps": self.fps,
+            "achieved_fps": (len(self.send_times) - 1) / window if window else 0.0,
+            "frames_sent": self.frames_sent,
+            "dropped_frames": self.dropped_frames,
+            "superseded_values": self.superseded_values,
+        }
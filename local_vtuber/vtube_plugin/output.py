@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+import pyaudio
+
+from .constants import OUTPUT_BUFFER_SECONDS, OUTPUT_CHANNELS, OUTPUT_FRAMES_PER_BUFFER, OUTPUT_SAMPLE_RATE
+
+
+class AudioOutputEngine:
+    """
+    One long-lived callback-mode output stream fed from a ring buffer of 16-bit PCM frames.
+
+    Clips written one after another are played back to back with no gap; the
+    callback outputs silence only when the ring runs dry. Positions are counted
+    in frames since the engine started: ``write`` returns where a clip begins
+    and ``position`` reports the frame being heard right now.
+    """
+
+    def __init__(self, rate=OUTPUT_SAMPLE_RATE, channels=OUTPUT_CHANNELS,
+                 frames_per_buffer=OUTPUT_FRAMES_PER_BUFFER, buffer_seconds=OUTPUT_BUFFER_SECONDS):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.capacity = int(rate * buffer_seconds)
+        self.ring = np.zeros((self.capacity, channels), dtype=np.int16)
+        # Total frames written to and read from the ring; the difference is what is queued
+        self.write_pos = 0
+        self.read_pos = 0
+        # Bumped by flush so writers blocked on a full ring give up
+        self.generation = 0
+        self.condition = threading.Condition()
+        self.clock = (time.monotonic(), 0)
+        self.latency = 0.0
+        self.pyaudio = None
+        self.stream = None
+
+    def start(self):
+        if self.stream is not None:
+            return
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paInt16,
+                                        channels=self.channels,
+                                        rate=self.rate,
+                                        output=True,
+                                        frames_per_buffer=self.frames_per_buffer,
+                                        stream_callback=self._callback)
+        self.latency = self.stream.get_output_latency()
+        self.stream.start_stream()
+
+    def close(self):
+        self.flush()
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.pyaudio.terminate()
+            self.stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        out = np.zeros((frame_count, self.channels), dtype=np.int16)
+        with self.condition:
+            self.clock = (time.monotonic(), self.read_pos)
+            available = min(frame_count, self.write_pos - self.read_pos)
+            start = self.read_pos % self.capacity
+            first = min(available, self.capacity - start)
+            out[:first] = self.ring[start:start + first]
+            out[first:available] = self.ring[:available - first]
+            self.read_pos += available
+            self.condition.notify_all()
+        return out.tobytes(), pyaudio.paContinue
+
+    def write(self, samples, on_start=None):
+        """
+        Append ``samples`` (int16, shape ``(frames, channels)``), blocking while the ring is full.
+        ``on_start`` is called with the clip's start position before any frame can be played.
+        Returns that position, or None if the engine was flushed before the clip was fully queued.
+        """
+        with self.condition:
+            generation = self.generation
+            start = self.write_pos
+            if on_start is not None:
+                on_start(start)
+            offset = 0
+            while offset < len(samples):
+                while self.write_pos - self.read_pos >= self.capacity:
+                    self.condition.wait()
+                    if self.generation != generation:
+                        return None
+                count = min(len(samples) - offset, self.capacity - (self.write_pos - self.read_pos))
+                index = self.write_pos % self.capacity
+                first = min(count, self.capacity - index)
+                self.ring[index:index + first] = samples[offset:offset + first]
+                self.ring[:count - first] = samples[offset + first:offset + count]
+                self.write_pos += count
+                offset += count
+            return start
+
+    def flush(self):
+        """Drop everything queued; the stream goes silent within one buffer period."""
+        with self.condition:
+            self.read_pos = self.write_pos
+            self.generation += 1
+            self.condition.notify_all()
+
+    def position(self):
+        """Frame being heard now, interpolated from the last callback and the output latency."""
+        with self.condition:
+            callback_time, callback_pos = self.clock
+            read_pos = self.read_pos
+        heard = callback_pos + (time.monotonic() - callback_time - self.latency) * self.rate
+        return min(heard, read_pos)